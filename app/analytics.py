@@ -0,0 +1,115 @@
+import datetime
+
+from app import sql
+
+# Отчеты строятся только по сверткам ticket_stats_* (см. app.sql), без чтения ticket.
+
+
+def _resolution_summary(buckets):
+    """
+    Сводка времени выполнения по корзинам.
+
+    Parameters:
+        buckets (dict): Номер корзины -> (количество, суммарное время в секундах).
+
+    Returns:
+        dict: Количество, среднее время и оценки медианы и p90 в секундах
+            (верхняя граница корзины; None - дольше последней границы или нет данных).
+    """
+    count = sum(total for total, _ in buckets.values())
+    summary = {'count': count, 'avg': None, 'median': None, 'p90': None}
+    if not count:
+        return summary
+    summary['avg'] = sum(seconds for _, seconds in buckets.values()) / count
+    for name, q in (('median', 0.5), ('p90', 0.9)):
+        seen = 0
+        for bucket in sorted(buckets):
+            seen += buckets[bucket][0]
+            if seen >= q * count:
+                summary[name] = sql.RESOLUTION_BUCKETS[bucket] if bucket < len(sql.RESOLUTION_BUCKETS) else None
+                break
+    return summary
+
+
+def _group_resolution(rows):
+    # (ключ, корзина, количество, время) -> {ключ: сводка}
+    grouped = {}
+    for key, bucket, total, seconds in rows:
+        grouped.setdefault(key, {})[bucket] = (total, seconds)
+    return {key: _resolution_summary(buckets) for key, buckets in grouped.items()}
+
+
+def get_report(days=7, today=None, top=5):
+    """
+    Собирает статистику за последние days дней (включая сегодня).
+
+    Parameters:
+        days (int): Длина периода в днях (по умолчанию 7).
+        today (datetime.date): Последний день периода (по умолчанию сегодня).
+        top (int): Сколько организаций и исполнителей выводить (по умолчанию 5).
+
+    Returns:
+        dict: Ключи:
+            'days' - список (день, создано, завершено, открыто на конец дня);
+            'created', 'completed' - итоги за период;
+            'resolution' - сводка времени выполнения (count, avg, median, p90);
+            'organizations' - список (организация, создано, завершено, среднее время выполнения или None);
+            'moderators' - список (ID исполнителя или 0, сводка времени выполнения);
+            'busiest_hours' - список (час суток, создано заявок).
+    """
+    today = today or datetime.date.today()
+    first_day = (today - datetime.timedelta(days=days - 1)).isoformat()
+    last_day = today.isoformat()
+    period = (first_day, last_day)
+
+    # Объем по дням и открытые заявки на конец каждого дня (от текущего остатка назад)
+    hours = (first_day + ' 00', last_day + ' 23')
+    flow = dict((day, (created, completed)) for day, created, completed in sql.execute_query('''
+        SELECT substr(hour, 1, 10), SUM(created), SUM(completed) FROM ticket_stats_hourly
+        WHERE hour BETWEEN ? AND ? GROUP BY 1
+    ''', hours))
+    later = sql.execute_query('SELECT SUM(created) - SUM(completed) FROM ticket_stats_hourly WHERE hour > ?',
+                              (hours[1],))[0][0]
+    backlog = sql.get_total_tickets_by_status_admin("В работе") - (later or 0)
+    daily = []
+    for offset in range(days):
+        day = (today - datetime.timedelta(days=offset)).isoformat()
+        created, completed = flow.get(day, (0, 0))
+        daily.append((day, created, completed, backlog))
+        backlog -= created - completed
+    daily.reverse()
+
+    moderator_resolution = _group_resolution(sql.execute_query('''
+        SELECT moderator, bucket, SUM(total), SUM(resolution_total) FROM ticket_stats_resolution
+        WHERE day BETWEEN ? AND ? GROUP BY moderator, bucket
+    ''', period))
+    resolution = _group_resolution(sql.execute_query('''
+        SELECT 0, bucket, SUM(total), SUM(resolution_total) FROM ticket_stats_resolution
+        WHERE day BETWEEN ? AND ? GROUP BY bucket
+    ''', period))
+    moderators = sorted(moderator_resolution.items(), key=lambda item: item[1]['count'], reverse=True)[:top]
+
+    # По организациям - только объем и среднее время выполнения
+    organizations = [
+        (organization, created, completed, resolution_total / resolved if resolved else None)
+        for organization, created, completed, resolved, resolution_total in sql.execute_query('''
+            SELECT organization, SUM(created), SUM(completed), SUM(resolved), SUM(resolution_total)
+            FROM ticket_stats_daily WHERE day BETWEEN ? AND ? GROUP BY organization
+            ORDER BY SUM(created) DESC, SUM(completed) DESC LIMIT ?
+        ''', period + (top,))
+    ]
+
+    busiest_hours = sql.execute_query('''
+        SELECT CAST(substr(hour, 12, 2) AS INTEGER), SUM(created) FROM ticket_stats_hourly
+        WHERE hour BETWEEN ? AND ? GROUP BY 1 HAVING SUM(created) > 0 ORDER BY 2 DESC LIMIT 3
+    ''', hours)
+
+    return {
+        'days': daily,
+        'created': sum(row[1] for row in daily),
+        'completed': sum(row[2] for row in daily),
+        'resolution': resolution.get(0, _resolution_summary({})),
+        'organizations': organizations,
+        'moderators': moderators,
+        'busiest_hours': busiest_hours,
+    }
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+
+from app import async_sql as db
+
+# Архивация идет небольшими пачками через поток базы данных: между пачками
+# выполняются запросы бота, поэтому перенос не блокирует обработку обновлений.
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.05
+
+_task = None
+
+logger = logging.getLogger(__name__)
+
+
+async def archive_old_tickets(days, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """
+    Переносит в архив все заявки, завершенные больше days дней назад.
+
+    Parameters:
+        days (int): Возраст заявки в днях.
+        batch_size (int): Размер пачки (по умолчанию BATCH_SIZE).
+        pause (float): Пауза между пачками в секундах (по умолчанию BATCH_PAUSE).
+
+    Returns:
+        int: Количество перенесенных заявок.
+    """
+    before = int(time.time()) - days * 86400
+    total = 0
+    while True:
+        moved = await db.archive_tickets(before, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+        await asyncio.sleep(pause)
+
+
+async def _archive_loop(days, interval):
+    while True:
+        try:
+            moved = await archive_old_tickets(days)
+            if moved:
+                logger.info("В архив перенесено заявок: %s", moved)
+        except Exception:
+            logger.exception("Не удалось перенести заявки в архив")
+        await asyncio.sleep(interval)
+
+
+def start(days, interval):
+    """
+    Запускает периодическую архивацию (days <= 0 - не архивировать).
+    """
+    global _task
+    if days > 0 and _task is None:
+        _task = asyncio.get_event_loop().create_task(_archive_loop(days, interval))
+
+
+async def shutdown():
+    """
+    Останавливает периодическую архивацию (текущая пачка успевает завершиться в потоке базы данных).
+    """
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import analytics, metrics, sql
+
+# Все запросы выполняются в одном выделенном потоке: очередь ThreadPoolExecutor
+# упорядочивает их, а цикл событий aiogram не блокируется на диске.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sql')
+
+
+async def run(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию app.sql в потоке базы данных.
+
+    Parameters:
+        func (callable): Функция из app.sql.
+        *args, **kwargs: Аргументы функции.
+
+    Returns:
+        Результат функции.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _timed, time.perf_counter(), func, args, kwargs)
+
+
+def _timed(submitted, func, args, kwargs):
+    # Выполняется в потоке базы данных: время ожидания очереди и время самой функции
+    start = time.perf_counter()
+    metrics.SQL_WAIT_SECONDS.observe(start - submitted)
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        metrics.SQL_ERRORS.inc(func.__name__)
+        raise
+    finally:
+        metrics.SQL_SECONDS.observe(time.perf_counter() - start, func.__name__)
+
+
+def _wrap(func):
+    """
+    Создает асинхронный аналог функции app.sql.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+async def shutdown():
+    """
+    Закрывает соединения в потоке базы данных и останавливает поток.
+    """
+    await run(sql.close_connections)
+    _executor.shutdown(wait=True)
+
+
+create_tables = _wrap(sql.create_tables)
+add_user = _wrap(sql.add_user)
+get_user_by_id = _wrap(sql.get_user_by_id)
+get_user_cache_stats = _wrap(sql.get_user_cache_stats)
+add_ticket = _wrap(sql.add_ticket)
+create_ticket = _wrap(sql.create_ticket)
+get_last_ticket_number = _wrap(sql.get_last_ticket_number)
+get_total_tickets_by_status = _wrap(sql.get_total_tickets_by_status)
+get_total_tickets_by_status_admin = _wrap(sql.get_total_tickets_by_status_admin)
+get_total_tickets_by_status_for_user = _wrap(sql.get_total_tickets_by_status_for_user)
+get_user_dashboard = _wrap(sql.get_user_dashboard)
+get_admin_dashboard = _wrap(sql.get_admin_dashboard)
+get_tickets_in_progress_by_user_id = _wrap(sql.get_tickets_in_progress_by_user_id)
+update_pos = _wrap(sql.update_pos)
+read_pos = _wrap(sql.read_pos)
+update_positions = _wrap(sql.update_positions)
+update_profile = _wrap(sql.update_profile)
+update_profile_data = _wrap(sql.update_profile_data)
+read_cell = _wrap(sql.read_cell)
+read_profile = _wrap(sql.read_profile)
+get_all_tickets_in_progress = _wrap(sql.get_all_tickets_in_progress)
+get_tickets_in_progress_page = _wrap(sql.get_tickets_in_progress_page)
+get_organizations_in_progress = _wrap(sql.get_organizations_in_progress)
+search_tickets = _wrap(sql.search_tickets)
+get_ticket_info = _wrap(sql.get_ticket_info)
+update_ticket_status = _wrap(sql.update_ticket_status)
+complete_ticket = _wrap(sql.complete_ticket)
+get_tickets_by_period = _wrap(sql.get_tickets_by_period)
+get_resolution_stats = _wrap(sql.get_resolution_stats)
+get_stats_report = _wrap(analytics.get_report)
+archive_tickets = _wrap(sql.archive_tickets)
+get_archive_stats = _wrap(sql.get_archive_stats)
+get_completed_tickets_by_user = _wrap(sql.get_completed_tickets_by_user)
+get_completed_tickets_page = _wrap(sql.get_completed_tickets_page)
+update_ticket_comment = _wrap(sql.update_ticket_comment)
+read_ticket_comment = _wrap(sql.read_ticket_comment)
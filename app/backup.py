@@ -0,0 +1,178 @@
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import sql
+
+# Резервное копирование через online backup API SQLite. Копия снимается с
+# отдельного соединения, открывшего читающую транзакцию: в режиме WAL это
+# снимок базы на момент начала, который не мешает записи из app.sql и не
+# перезапускается от изменений других соединений. Страницы копируются,
+# а копия сжимается порциями с паузой между ними, чтобы копирование не
+# забирало процессор и диск у бота.
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.01
+COMPRESS_CHUNK = 1024 * 1024
+# Уровень 1: база сжимается почти так же, как на 6, но в несколько раз быстрее
+COMPRESS_LEVEL = 1
+KEEP = 7
+
+# Копирование выполняется в отдельном потоке, по одной копии за раз
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backup')
+_task = None
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_database(source_path, target_path, pages, pause):
+    """
+    Копирует базу source_path в target_path порциями по pages страниц и
+    проверяет копию PRAGMA integrity_check.
+
+    Returns:
+        int: Количество шагов копирования.
+
+    Raises:
+        sqlite3.DatabaseError: Если копия не прошла проверку целостности.
+    """
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining and pause:
+            time.sleep(pause)
+
+    source = sqlite3.connect(source_path, isolation_level=None)
+    target = sqlite3.connect(target_path, isolation_level=None)
+    try:
+        # Читающая транзакция фиксирует снимок на все время копирования
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=pages, progress=progress)
+        source.execute('COMMIT')
+        # Копия - один самостоятельный файл без -wal
+        target.execute('PRAGMA journal_mode=DELETE')
+        result = target.execute('PRAGMA integrity_check').fetchall()
+        if result != [('ok',)]:
+            raise sqlite3.DatabaseError(f"Копия {source_path} не прошла проверку целостности: {result[:5]}")
+    finally:
+        source.close()
+        target.close()
+    return steps
+
+
+def _compress(source_path, target_path, pause):
+    # Сжатие порциями по COMPRESS_CHUNK с паузой между ними
+    with open(source_path, 'rb') as source, gzip.open(target_path, 'wb', compresslevel=COMPRESS_LEVEL) as target:
+        while True:
+            chunk = source.read(COMPRESS_CHUNK)
+            if not chunk:
+                return
+            target.write(chunk)
+            if pause:
+                time.sleep(pause)
+
+
+def _rotate(directory, prefix, keep):
+    """
+    Удаляет старые копии с префиксом prefix, оставляя keep последних.
+
+    Returns:
+        list: Удаленные файлы.
+    """
+    backups = sorted(name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith('.db.gz'))
+    removed = backups[:-keep] if keep > 0 else []
+    for name in removed:
+        os.remove(os.path.join(directory, name))
+    return removed
+
+
+def backup_database(directory, keep=KEEP, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """
+    Создает сжатые копии основной базы и архива в directory и удаляет старые.
+    Файлы называются <имя базы>-<ГГГГММДД-ЧЧММСС>.db.gz.
+
+    Parameters:
+        directory (str): Каталог для копий (создается при необходимости).
+        keep (int): Сколько последних копий каждой базы хранить (по умолчанию KEEP).
+        pages (int): Страниц за один шаг копирования (по умолчанию PAGES_PER_STEP).
+        pause (float): Пауза между шагами в секундах (по умолчанию STEP_PAUSE).
+
+    Returns:
+        list: Для каждой базы - словарь: path, size, steps, seconds, removed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    sources = [sql.DB_PATH, os.path.join(os.path.dirname(sql.DB_PATH), sql.ARCHIVE_FILE)]
+    results = []
+    for source_path in sources:
+        if not os.path.exists(source_path):
+            continue
+        start = time.perf_counter()
+        prefix = os.path.splitext(os.path.basename(source_path))[0] + '-'
+        path = os.path.join(directory, f'{prefix}{stamp}.db.gz')
+        copy_path = path[:-len('.gz')] + '.tmp'
+        try:
+            steps = _copy_database(source_path, copy_path, pages, pause)
+            # Сжатие во временный файл и переименование: незаконченная копия не попадет в ротацию
+            _compress(copy_path, path + '.tmp', pause)
+            os.replace(path + '.tmp', path)
+        finally:
+            for leftover in (copy_path, path + '.tmp'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        results.append({
+            'path': path,
+            'size': os.path.getsize(path),
+            'steps': steps,
+            'seconds': time.perf_counter() - start,
+            'removed': _rotate(directory, prefix, keep),
+        })
+    return results
+
+
+async def run_backup(directory, keep=KEEP):
+    """
+    Выполняет backup_database в потоке резервного копирования.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, backup_database, directory, keep)
+
+
+async def _backup_loop(directory, interval, keep):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for result in await run_backup(directory, keep):
+                logger.info("Резервная копия %s: %.1f МБ за %.1f с, удалено старых: %s", result['path'],
+                            result['size'] / 2 ** 20, result['seconds'], len(result['removed']))
+        except Exception:
+            logger.exception("Не удалось создать резервную копию")
+
+
+def start(directory, interval, keep=KEEP):
+    """
+    Запускает периодическое резервное копирование (interval <= 0 - не копировать).
+    """
+    global _task
+    if interval > 0 and _task is None:
+        _task = asyncio.get_event_loop().create_task(_backup_loop(directory, interval, keep))
+
+
+async def shutdown():
+    """
+    Останавливает периодическое копирование и дожидается текущей копии.
+    """
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+    await asyncio.get_running_loop().run_in_executor(_executor, lambda: None)
+    _executor.shutdown(wait=True)
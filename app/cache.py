@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Значение по умолчанию для get(), отличимое от сохраненного None
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш с ограничением размера (LRU) и временем жизни записей.
+
+    Parameters:
+        max_size (int): Максимальное количество записей.
+        ttl (float): Время жизни записи в секундах.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # ключ -> (срок истечения, значение)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=MISSING):
+        """
+        Возвращает значение по ключу или default при промахе.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Сохраняет значение, вытесняя самые давно использованные записи.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Удаляет запись из кэша.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Очищает кэш.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+        Возвращает статистику кэша.
+
+        Returns:
+            dict: Размер, попадания, промахи, доля попаданий, вытеснения и истечения.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
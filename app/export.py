@@ -0,0 +1,122 @@
+import asyncio
+import csv
+import datetime
+import gzip
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app import sql
+
+# Выгрузка выполняется в отдельном потоке со своим соединением: в режиме WAL
+# чтение не мешает потоку базы данных бота, а цикл событий не блокируется.
+# Выгрузки выполняются по одной.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+
+FORMATS = ('csv', 'jsonl')
+# Статусы в аргументах команды /export
+STATES = {
+    'open': "В работе",
+    'done': "Завершена",
+    'all': None,
+}
+# Уровень сжатия gzip: 6 почти не уступает 9 по размеру и заметно быстрее
+COMPRESS_LEVEL = 6
+# Ограничение Bot API на размер отправляемого файла
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+
+def parse_args(text):
+    """
+    Разбирает аргументы команды /export: формат, статус, даты "с" и "по"
+    (ГГГГ-ММ-ДД, включительно) в любом порядке, остальные слова - организация.
+
+    Parameters:
+        text (str): Аргументы команды, например "csv done 2024-01-01 2024-03-31 ООО Ромашка".
+
+    Returns:
+        dict: Параметры выгрузки: format, state, start, end, organization.
+
+    Raises:
+        ValueError: Если дата указана неверно.
+    """
+    params = {'format': FORMATS[0], 'state': None, 'start': None, 'end': None, 'organization': None}
+    dates, organization = [], []
+    for word in text.split():
+        if word.lower() in FORMATS:
+            params['format'] = word.lower()
+        elif word.lower() in STATES:
+            params['state'] = STATES[word.lower()]
+        elif re.fullmatch(r'\d{4}-\d{2}-\d{2}', word):
+            dates.append(datetime.datetime.strptime(word, '%Y-%m-%d'))
+        else:
+            organization.append(word)
+    if len(dates) > 2:
+        raise ValueError("Укажите не больше двух дат")
+    if dates:
+        params['start'] = dates[0]
+        params['end'] = dates[-1] + datetime.timedelta(days=1)
+    params['organization'] = ' '.join(organization) or None
+    return params
+
+
+def write_tickets(path, format='csv', **filters):
+    """
+    Записывает заявки из sql.iter_tickets в сжатый gzip файл построчно.
+
+    Parameters:
+        path (str): Путь к файлу.
+        format (str): 'csv' или 'jsonl' (по умолчанию 'csv').
+        **filters: Фильтры sql.iter_tickets (start, end, state, organization).
+
+    Returns:
+        int: Количество выгруженных заявок.
+    """
+    names = [name for name, _ in sql.EXPORT_COLUMNS]
+    count = 0
+    with gzip.open(path, 'wt', compresslevel=COMPRESS_LEVEL, encoding='utf-8', newline='') as file:
+        if format == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(names)
+            for row in sql.iter_tickets(**filters):
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in sql.iter_tickets(**filters):
+                file.write(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n')
+                count += 1
+    return count
+
+
+async def export_tickets(format='csv', **filters):
+    """
+    Выгружает заявки во временный файл в потоке выгрузки.
+    Файл удаляет вызывающий после отправки.
+
+    Parameters:
+        format (str): 'csv' или 'jsonl' (по умолчанию 'csv').
+        **filters: Фильтры sql.iter_tickets (start, end, state, organization).
+
+    Returns:
+        tuple: Путь к файлу и количество выгруженных заявок.
+    """
+    fd, path = tempfile.mkstemp(prefix='tickets_', suffix=f'.{format}.gz')
+    os.close(fd)
+    loop = asyncio.get_running_loop()
+    try:
+        count = await loop.run_in_executor(_executor, lambda: write_tickets(path, format, **filters))
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, count
+
+
+async def shutdown():
+    """
+    Дожидается текущей выгрузки и останавливает поток
+    (соединение потока закрывает sql.close_connections).
+    """
+    await asyncio.get_running_loop().run_in_executor(_executor, lambda: None)
+    _executor.shutdown(wait=True)
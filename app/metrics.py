@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from aiogram import Bot
+from aiogram.utils.exceptions import TelegramAPIError
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в секундах
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _format_labels(labelnames, labels, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """
+    Счетчик с метками.
+
+    Parameters:
+        name (str): Имя метрики.
+        documentation (str): Описание для /metrics.
+        labelnames (tuple): Имена меток.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def values(self):
+        """
+        Returns:
+            dict: Значения счетчика по наборам меток.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Gauge:
+    """
+    Текущее значение с метками (например, глубина очереди).
+
+    Parameters:
+        name (str): Имя метрики.
+        documentation (str): Описание для /metrics.
+        labelnames (tuple): Имена меток.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def values(self):
+        """
+        Returns:
+            dict: Значения по наборам меток.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        for labels, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    """
+    Гистограмма длительностей с фиксированными корзинами и метками.
+
+    Parameters:
+        name (str): Имя метрики.
+        documentation (str): Описание для /metrics.
+        labelnames (tuple): Имена меток.
+        buckets (tuple): Верхние границы корзин в секундах.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Метки -> [счетчики по корзинам (+Inf последним), сумма, количество]
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Контекстный менеджер, записывающий длительность блока.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _series_copy(self):
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def _quantile(self, counts, count, q):
+        # Оценка квантиля по верхней границе корзины
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def summary(self):
+        """
+        Returns:
+            dict: Для каждого набора меток - количество, средняя длительность и оценки p50/p95/p99.
+        """
+        result = {}
+        for labels, (counts, total, count) in self._series_copy().items():
+            result[labels] = {
+                'count': count,
+                'avg': total / count,
+                'p50': self._quantile(counts, count, 0.5),
+                'p95': self._quantile(counts, count, 0.95),
+                'p99': self._quantile(counts, count, 0.99),
+            }
+        return result
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self._series_copy().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            bucket_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            series_labels = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_bucket{bucket_labels} {count}')
+            lines.append(f'{self.name}_sum{series_labels} {total}')
+            lines.append(f'{self.name}_count{series_labels} {count}')
+        return lines
+
+
+UPDATE_SECONDS = Histogram('helpdesk_update_seconds', 'Время обработки обновления', ('type',))
+HANDLER_SECONDS = Histogram('helpdesk_handler_seconds', 'Время работы обработчика aiogram', ('handler',))
+CALLBACK_SECONDS = Histogram('helpdesk_callback_seconds', 'Время обработки действия кнопки', ('action',))
+POSITION_SECONDS = Histogram('helpdesk_position_seconds', 'Время обработки текстового ввода по позиции', ('position',))
+SQL_SECONDS = Histogram('helpdesk_sql_seconds', 'Время выполнения функции app.sql в потоке базы данных', ('query',))
+SQL_WAIT_SECONDS = Histogram('helpdesk_sql_wait_seconds', 'Время ожидания потока базы данных')
+SQL_ERRORS = Counter('helpdesk_sql_errors_total', 'Ошибки функций app.sql', ('query',))
+TELEGRAM_SECONDS = Histogram('helpdesk_telegram_api_seconds', 'Время запроса к Bot API', ('method',))
+TELEGRAM_ERRORS = Counter('helpdesk_telegram_api_errors_total', 'Ошибки запросов к Bot API', ('method', 'error'))
+NOTIFY_QUEUE_DEPTH = Gauge('helpdesk_notify_queue_depth', 'Уведомлений в очереди на отправку')
+NOTIFY_MESSAGES = Counter('helpdesk_notify_messages_total', 'Уведомления по результату отправки', ('result',))
+NOTIFY_RETRIES = Counter('helpdesk_notify_retries_total', 'Повторные попытки отправки уведомлений', ('reason',))
+
+
+def render():
+    """
+    Возвращает все метрики в текстовом формате Prometheus.
+
+    Returns:
+        str: Текст для ответа /metrics.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot(limit=10):
+    """
+    Краткая сводка для лога: самые медленные по p95 обработчики, действия и запросы.
+
+    Parameters:
+        limit (int): Сколько позиций выводить для каждой гистограммы.
+
+    Returns:
+        dict: Имя метрики -> список строк вида 'метки count=.. avg=..ms p95=..ms'.
+    """
+    result = {}
+    for metric in _registry:
+        if not isinstance(metric, Histogram):
+            continue
+        summary = sorted(metric.summary().items(), key=lambda item: item[1]['p95'], reverse=True)[:limit]
+        if summary:
+            result[metric.name] = [
+                f"{'/'.join(map(str, labels)) or '-'} count={s['count']} avg={s['avg'] * 1000:.1f}ms p95<={s['p95'] * 1000:g}ms"
+                for labels, s in summary
+            ]
+    return result
+
+
+async def _log_loop(interval):
+    while True:
+        await asyncio.sleep(interval)
+        for name, lines in snapshot().items():
+            logger.info("%s: %s", name, '; '.join(lines))
+
+
+_log_task = None
+
+
+def start_logging(interval):
+    """
+    Запускает периодический вывод сводки метрик в лог (interval <= 0 - не выводить).
+    """
+    global _log_task
+    if interval > 0 and _log_task is None:
+        _log_task = asyncio.get_event_loop().create_task(_log_loop(interval))
+
+
+async def stop_logging():
+    global _log_task
+    if _log_task is not None:
+        _log_task.cancel()
+        await asyncio.gather(_log_task, return_exceptions=True)
+        _log_task = None
+
+
+class MeteredBot(Bot):
+    """
+    Bot, записывающий длительность и ошибки каждого запроса к Bot API.
+    """
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().request(method, data, files, **kwargs)
+        except TelegramAPIError as e:
+            TELEGRAM_ERRORS.inc(method, type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, method)
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+
+from aiogram.dispatcher.handler import CancelHandler, current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from app import metrics
+from app.cache import TTLCache
+
+# Поля Update с содержимым обновления, самые частые - первыми
+UPDATE_TYPES = (
+    'message', 'callback_query', 'edited_message', 'channel_post', 'edited_channel_post', 'inline_query',
+    'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'poll', 'poll_answer', 'my_chat_member',
+    'chat_member', 'chat_join_request',
+)
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничивает количество одновременно обрабатываемых обновлений.
+    Работает одинаково в режимах polling и webhook: лишние обновления ждут
+    освобождения слота до вызова обработчиков.
+
+    Parameters:
+        limit (int): Максимальное количество обновлений в обработке.
+    """
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def on_pre_process_update(self, update, data):
+        await self._semaphore.acquire()
+        self.in_flight += 1
+
+    async def on_post_process_update(self, update, results, data):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+class DeduplicateUpdatesMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторно доставленные обновления с уже обработанным update_id
+    (повторы webhook после таймаута, перезапрос getUpdates).
+
+    Должна подключаться раньше ConcurrencyLimitMiddleware: отмененное здесь
+    обновление не доходит до захвата слота и не требует его освобождения.
+
+    Parameters:
+        size (int): Сколько последних update_id помнить.
+        ttl (float): Сколько секунд помнить update_id.
+    """
+
+    def __init__(self, size=10000, ttl=600):
+        super().__init__()
+        self.duplicates = 0
+        self._seen = TTLCache(size, ttl)
+
+    async def on_pre_process_update(self, update, data):
+        if update.update_id in self._seen:
+            self.duplicates += 1
+            raise CancelHandler()
+        self._seen.put(update.update_id, True)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Записывает длительность обработки обновлений (по типу) и обработчиков
+    aiogram (по имени функции) в гистограммы app.metrics.
+
+    Parameters:
+        sample_rate (float): Доля замеряемых обновлений (1.0 - все).
+    """
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    async def on_pre_process_update(self, update, data):
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            data['metrics_start'] = time.perf_counter()
+
+    async def on_post_process_update(self, update, results, data):
+        start = data.get('metrics_start')
+        if start is not None:
+            # Тип по атрибутам: итерация по Update сериализует все обновление (to_python)
+            update_type = next((name for name in UPDATE_TYPES if getattr(update, name) is not None), 'unknown')
+            metrics.UPDATE_SECONDS.observe(time.perf_counter() - start, update_type)
+
+    async def _start_handler(self, data):
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            data['metrics_handler'] = (current_handler.get().__name__, time.perf_counter())
+
+    async def _finish_handler(self, data):
+        handler = data.get('metrics_handler')
+        if handler is not None:
+            metrics.HANDLER_SECONDS.observe(time.perf_counter() - handler[1], handler[0])
+
+    async def on_process_message(self, message, data):
+        await self._start_handler(data)
+
+    async def on_post_process_message(self, message, results, data):
+        await self._finish_handler(data)
+
+    async def on_process_callback_query(self, query, data):
+        await self._start_handler(data)
+
+    async def on_post_process_callback_query(self, query, results, data):
+        await self._finish_handler(data)
@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.utils import exceptions
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram: ~30 сообщений в секунду всего и ~1 в секунду в один чат
+GLOBAL_RATE = 25
+CHAT_RATE = 1
+CHAT_BURST = 3
+QUEUE_SIZE = 10000
+WORKERS = 4
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Количество чатов, для которых хранится состояние ограничителя
+MAX_CHAT_BUCKETS = 10000
+# Сколько получателей рассылки обслуживается одновременно
+BROADCAST_CONCURRENCY = 10
+# Максимум уведомлений в одной сводке (при достижении сводка отправляется сразу)
+DIGEST_MAX_ITEMS = 50
+
+# Ошибки, после которых повторная отправка имеет смысл
+TRANSIENT_ERRORS = (exceptions.NetworkError, exceptions.RestartingTelegram, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты "ведро токенов".
+
+    Parameters:
+        rate (float): Скорость пополнения, токенов в секунду.
+        capacity (float): Емкость ведра (допустимый всплеск).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """
+        Приостанавливает выдачу токенов (например, по RetryAfter).
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """
+        Ждет и забирает один токен.
+        """
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Notifier:
+    """
+    Очередь исходящих сообщений с ограничением частоты и повторами.
+
+    Обработчики только ставят сообщения в очередь через enqueue(), отправкой
+    занимаются фоновые воркеры: они соблюдают общий лимит и лимит на чат,
+    выдерживают паузу RetryAfter и повторяют временные ошибки с backoff.
+
+    Parameters:
+        bot (aiogram.Bot): Бот, через который отправляются сообщения.
+    """
+
+    def __init__(self, bot, queue_size=QUEUE_SIZE, workers=WORKERS):
+        self.bot = bot
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chat_buckets = OrderedDict()
+        self._tasks = []
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+
+    @property
+    def depth(self):
+        """
+        Количество сообщений, ожидающих отправки.
+        """
+        return self.queue.qsize()
+
+    def stats(self):
+        """
+        Возвращает метрики очереди.
+
+        Returns:
+            dict: Глубина очереди и счетчики отправленных, неудачных, отброшенных и повторных сообщений.
+        """
+        return {
+            'queue_depth': self.depth,
+            'sent': self.sent,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'retried': self.retried,
+        }
+
+    def enqueue(self, chat_id, text, **kwargs):
+        """
+        Ставит сообщение в очередь на отправку без ожидания.
+
+        Parameters:
+            chat_id (int): ID чата получателя.
+            text (str): Текст сообщения.
+            **kwargs: Параметры bot.send_message (reply_markup, parse_mode и т.д.).
+
+        Returns:
+            bool: False, если очередь переполнена и сообщение отброшено.
+        """
+        return self._put(chat_id, text, kwargs)
+
+    def broadcast(self, chat_ids, text, **kwargs):
+        """
+        Ставит в очередь одно сообщение для нескольких чатов.
+
+        Рассылка занимает одно место в очереди; воркер отправляет ее всем
+        получателям параллельно (не более BROADCAST_CONCURRENCY одновременно).
+
+        Parameters:
+            chat_ids (iterable): ID чатов получателей (повторы отбрасываются).
+            text (str): Текст сообщения.
+            **kwargs: Параметры bot.send_message.
+
+        Returns:
+            bool: False, если очередь переполнена и рассылка отброшена.
+        """
+        chat_ids = tuple(dict.fromkeys(chat_ids))
+        if not chat_ids:
+            return True
+        if len(chat_ids) == 1:
+            return self._put(chat_ids[0], text, kwargs)
+        return self._put(chat_ids, text, kwargs)
+
+    def _put(self, chat_id, text, kwargs):
+        try:
+            self.queue.put_nowait((chat_id, text, kwargs, 1))
+            metrics.NOTIFY_QUEUE_DEPTH.set(self.depth)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            metrics.NOTIFY_MESSAGES.inc('dropped')
+            logger.warning("Очередь уведомлений переполнена, сообщение для %s отброшено", chat_id)
+            return False
+        return True
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+            while len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _send(self, chat_id, text, kwargs, attempt):
+        chat_bucket = self._chat_bucket(chat_id)
+        await chat_bucket.acquire()
+        await self.global_bucket.acquire()
+        try:
+            await self.bot.send_message(chat_id, text, **kwargs)
+        except exceptions.RetryAfter as e:
+            # Флуд-контроль Telegram: ждем указанное время и повторяем без учета попытки
+            logger.warning("RetryAfter %s с для чата %s", e.timeout, chat_id)
+            self.global_bucket.pause(e.timeout)
+            self.retried += 1
+            metrics.NOTIFY_RETRIES.inc('retry_after')
+            await self._send(chat_id, text, kwargs, attempt)
+        except TRANSIENT_ERRORS as e:
+            if attempt >= MAX_ATTEMPTS:
+                self.failed += 1
+                metrics.NOTIFY_MESSAGES.inc('failed')
+                logger.error("Не удалось отправить сообщение в %s после %s попыток: %s", chat_id, attempt, e)
+                return
+            self.retried += 1
+            metrics.NOTIFY_RETRIES.inc('transient')
+            await asyncio.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+            await self._send(chat_id, text, kwargs, attempt + 1)
+        except exceptions.TelegramAPIError as e:
+            # Бот заблокирован, чат не найден и т.п. - повтор не поможет
+            self.failed += 1
+            metrics.NOTIFY_MESSAGES.inc('failed')
+            logger.warning("Сообщение в %s не отправлено: %s", chat_id, e)
+        else:
+            self.sent += 1
+            metrics.NOTIFY_MESSAGES.inc('sent')
+
+    async def _fan_out(self, chat_ids, text, kwargs):
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+        async def send(chat_id):
+            async with semaphore:
+                await self._send(chat_id, text, kwargs, 1)
+
+        results = await asyncio.gather(*(send(chat_id) for chat_id in chat_ids), return_exceptions=True)
+        for chat_id, result in zip(chat_ids, results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                metrics.NOTIFY_MESSAGES.inc('failed')
+                logger.error("Ошибка отправки сообщения в %s", chat_id, exc_info=result)
+
+    async def _worker(self):
+        while True:
+            chat_id, text, kwargs, attempt = await self.queue.get()
+            metrics.NOTIFY_QUEUE_DEPTH.set(self.depth)
+            try:
+                if isinstance(chat_id, tuple):
+                    await self._fan_out(chat_id, text, kwargs)
+                else:
+                    await self._send(chat_id, text, kwargs, attempt)
+            except Exception:
+                self.failed += 1
+                metrics.NOTIFY_MESSAGES.inc('failed')
+                logger.exception("Ошибка отправки сообщения в %s", chat_id)
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        """
+        Запускает фоновые воркеры отправки.
+        """
+        if not self._tasks:
+            loop = asyncio.get_event_loop()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def shutdown(self, timeout=10):
+        """
+        Дожидается отправки очереди (не дольше timeout секунд) и останавливает воркеры.
+        """
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Не отправлено уведомлений при остановке: %s", self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class Digest:
+    """
+    Сводка уведомлений для группы получателей.
+
+    Первое уведомление открывает окно длиной interval секунд; все уведомления,
+    пришедшие за это время, отправляются одной рассылкой. Если за окно пришло
+    одно уведомление, оно отправляется как есть, иначе - текст summary(lines).
+    При interval <= 0 каждое уведомление рассылается сразу.
+
+    Parameters:
+        notifier (Notifier): Очередь, через которую отправляется рассылка.
+        chat_ids (iterable): ID чатов получателей.
+        interval (float): Длина окна в секундах.
+        summary (callable): Собирает текст сводки из списка строк.
+        **kwargs: Параметры bot.send_message.
+    """
+
+    def __init__(self, notifier, chat_ids, interval, summary, **kwargs):
+        self.notifier = notifier
+        self.chat_ids = tuple(dict.fromkeys(chat_ids))
+        self.interval = interval
+        self.summary = summary
+        self.kwargs = kwargs
+        self._pending = []
+        self._task = None
+
+    def add(self, text, line):
+        """
+        Добавляет уведомление.
+
+        Parameters:
+            text (str): Полный текст уведомления (если оно окажется единственным в окне).
+            line (str): Краткая строка для сводки.
+        """
+        if self.interval <= 0:
+            self.notifier.broadcast(self.chat_ids, text, **self.kwargs)
+            return
+        self._pending.append((text, line))
+        if len(self._pending) >= DIGEST_MAX_ITEMS:
+            self.flush()
+        elif self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.interval)
+        finally:
+            self._task = None
+            self.flush()
+
+    def flush(self):
+        """
+        Немедленно отправляет накопленные уведомления.
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if len(pending) == 1:
+            text = pending[0][0]
+        else:
+            text = self.summary([line for _, line in pending])
+        self.notifier.broadcast(self.chat_ids, text, **self.kwargs)
+
+    async def close(self):
+        """
+        Отменяет ожидание окна и отправляет накопленное.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.flush()
@@ -0,0 +1,227 @@
+import html
+from functools import lru_cache
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+# Статические клавиатуры и шаблоны сообщений собираются один раз при импорте.
+# Готовые клавиатуры переиспользуются между обновлениями и не должны изменяться.
+
+NO_DATA = "Нет данных"
+# Периоды экрана статистики в днях
+STATS_PERIODS = (7, 30, 90)
+
+
+def _keyboard(*rows):
+    keyboard = InlineKeyboardMarkup()
+    for row in rows:
+        keyboard.row(*(InlineKeyboardButton(text=text, callback_data=data) for text, data in row))
+    return keyboard
+
+
+# Клавиатуры
+WELCOME_KEYBOARD = _keyboard([("🏢 Моя компания", "my_company")])
+MAIN_MENU_KEYBOARD = _keyboard(
+    [("🏢 Моя компания", "my_company"), ("📥 Мои заявки", "my_ticket")],
+    [("📤 Новая заявка", "new_ticket")],
+)
+MAIN_MENU_ADMIN_KEYBOARD = _keyboard(
+    [("🏢 Моя компания", "my_company"), ("📥 Мои заявки", "my_ticket")],
+    [("📤 Новая заявка", "new_ticket")],
+    [("🤘 Тикет меню", "admin_panel")],
+)
+BACK_TO_MAIN_KEYBOARD = _keyboard([("⬅️ Назад", "main_menu")])
+BACK_TO_COMPANY_KEYBOARD = _keyboard([("⬅️ Назад", "my_company")])
+BACK_TO_ADMIN_KEYBOARD = _keyboard([("⬅️ Назад", "admin_panel")])
+MY_TICKET_KEYBOARD = _keyboard([("☑️ История заявок", "my_ticket_history")], [("⬅️ Назад", "main_menu")])
+DONE_TICKET_KEYBOARD = _keyboard([("🧑‍💻 Главное меню", "main_menu")])
+NEW_TICKET_ALERT_KEYBOARD = _keyboard([("🤘Тикет меню🫰", "admin_panel")])
+COMPLETION_USER_KEYBOARD = _keyboard([("☑️ История заявок", "my_ticket_history"), ("🧑‍💻 Главное меню", "main_menu")])
+COMPLETION_ADMIN_KEYBOARD = _keyboard([("🤘Тикет меню", "admin_panel")])
+
+
+@lru_cache(maxsize=None)
+def my_company_keyboard(name_filled, address_filled, inn_filled, phone_filled):
+    """
+    Возвращает клавиатуру экрана "Моя компания" для набора заполненных полей (16 вариантов).
+    """
+    def mark(filled):
+        return '✅' if filled else '❌'
+    return _keyboard(
+        [(f"{mark(name_filled)} Наименование компании", "edit_company_name")],
+        [(f"{mark(address_filled)} Фактический адрес", "edit_company_adress")],
+        [(f"{mark(inn_filled)} ИНН", "edit_company_inn")],
+        [(f"{mark(phone_filled)} Контактный номер", "edit_company_phone")],
+        [("⬅️ В меню", "main_menu")],
+    )
+
+
+def complete_ticket_keyboard(ticket_id):
+    """
+    Возвращает клавиатуру с кнопкой завершения тикета.
+    """
+    return _keyboard([("✅ Завершить задачу", f"complete_{ticket_id}")])
+
+
+# Постоянные тексты
+WELCOME_TEXT = "Добро пожаловать в HelpDesk компании <b>ЭниКей</b>! Для работы в сервисе необходимо заполнить данные."
+NEW_TICKET_TEXT = ("<b>📤 Создание новой заявки</b>\n\n"
+                   " - 🧩 Пожалуйста, опишите вашу проблему и укажите как можно подробнее.\n\n"
+                   "<b>Пример оформления заявки:</b> \n<i>Не работает принтер на 4 ПК, необходимо проверить подключение.</i>")
+EDIT_COMPANY_NAME_TEXT = "📋 Введите наименование организации. \nПример: <code> ООО РОГА И КОПЫТА </code>"
+EDIT_COMPANY_ADRESS_TEXT = "📍Введите фактический адрес организации. \nПример: <code> г. Иваново, ул. Пушкина, д. 3 оф. 1 </code>"
+EDIT_COMPANY_INN_TEXT = "📑 Введите ИНН организации. \nПример: <code> 3700010101 </code>"
+EDIT_COMPANY_PHONE_TEXT = "☎️ Введите контактный номер телефона. \nПример: <code> +79100009999 </code>"
+ADMIN_SEARCH_TEXT = ("<b>🔎 Поиск заявок</b>\n\n"
+                     "Введите слова для поиска по тексту заявки, комментарию, организации или адресу.\n"
+                     "Пример: <code>принтер ромашка</code>")
+EXPORT_HELP_TEXT = ("<b>📤 Выгрузка заявок</b>\n\n"
+                    "<code>/export [csv|jsonl] [open|done|all] [ГГГГ-ММ-ДД] [ГГГГ-ММ-ДД] [организация]</code>\n"
+                    "Даты - период создания заявки (включительно). Пример: <code>/export done 2024-01-01 2024-03-31</code>")
+EXPORT_PROGRESS_TEXT = "⏳ Готовлю выгрузку..."
+NO_TICKETS_TEXT = '<b>📥 Мои заявки </b>\n\nУ вас пока нет заявок в работе..  🤷‍♂️ \n- <i>Что бы оставить заявку воспользуйтесь меню </i><b>"📤 Новая заявка"</b>'
+
+# Шаблоны с параметрами
+MAIN_MENU_TEMPLATE = ("<b>🧑‍💻 Главное меню</b> \n\n"
+                      "<b>📋 Компания: </b> {organization}\n"
+                      "<b>☎️ Контактный номер:</b> {organization_phone}\n\n"
+                      "<b>📬Открытых заявок:</b> {open_tickets}\n"
+                      "<b>📭Закрытых заявок:</b> {closed_tickets}\n"
+                      "\nВыберите интересующее действие ⬇️").format
+MY_COMPANY_TEMPLATE = ("<b>🏢 Информация о компании</b>\n\n"
+                       "<b>📋 Компания:</b> {organization}\n"
+                       "<b>📍 Адрес:</b> {organization_adress}\n"
+                       "<b>📑 ИНН:</b> {organization_inn}\n"
+                       "<b>☎️ Контактный номер:</b> <i>{organization_phone}</i>\n\n"
+                       "<b>ЗАПОЛНИТЬ ДАННЫЕ О КОМПАНИИ ⬇️ </b>").format
+TICKET_DETAILS_TEMPLATE = ("<b>Детали заявки:</b> <code>#{0[0]}\n\n</code>"
+                           "<b>Пользователь ID:</b> <a href='tg://user?id={0[1]}'>{0[1]}</a>\n"
+                           "<b>Организация:</b> {0[2]}\n"
+                           "<b>Адрес:</b> {0[3]}\n\n"
+                           "<b>Сообщение от пользователя:</b> - <em>{0[4]}</em>\n\n"
+                           "<b>Время создания:</b> {0[5]}\n"
+                           "<b>Статус:</b> {0[6]}\n\n"
+                           "<em>⚠️ Для завершения задачи введите комментарий. В ответ вам придет сообщение с подтвержением!</em>").format
+DONE_TICKET_TEMPLATE = ('🎉🥳 Успех, ваша заявка зарегистрирована! \n\n<b>Номер заявки: </b><code>#{0}</code>. '
+                        '\n\n<i>PS: Отслеживайте статус поставленных задач в разделе</i> <b>"📥 Мои заявки"</b>').format
+NEW_TICKET_DIGEST_TEMPLATE = "📬❗️\n<b>Новых заявок: {count}</b> за последние {interval} с.\n\n{lines}".format
+NEW_TICKET_DIGEST_LINE = "<code>#{0}</code> {1} - <em>{2}</em>".format
+
+
+def search_snippet(snippet, start='\x02', end='\x03'):
+    """
+    Экранирует сниппет результата поиска и выделяет совпадения жирным.
+
+    Parameters:
+        snippet (str): Сниппет из sql.search_tickets.
+        start (str): Маркер начала совпадения.
+        end (str): Маркер конца совпадения.
+
+    Returns:
+        str: HTML-текст сниппета.
+    """
+    return html.escape(snippet or '').replace(start, '<b>').replace(end, '</b>')
+
+
+def main_menu(profile, open_tickets, closed_tickets, is_admin):
+    """
+    Возвращает текст и клавиатуру главного меню.
+
+    Parameters:
+        profile (dict): Профиль пользователя.
+        open_tickets (int): Количество открытых заявок.
+        closed_tickets (int): Количество закрытых заявок.
+        is_admin (bool): Показывать ли кнопку тикет меню.
+
+    Returns:
+        tuple: Текст сообщения и клавиатура.
+    """
+    text = MAIN_MENU_TEMPLATE(
+        organization=profile.get("organization", NO_DATA),
+        organization_phone=profile.get("organization_phone", NO_DATA),
+        open_tickets=open_tickets,
+        closed_tickets=closed_tickets,
+    )
+    return text, MAIN_MENU_ADMIN_KEYBOARD if is_admin else MAIN_MENU_KEYBOARD
+
+
+def my_company(profile):
+    """
+    Возвращает текст и клавиатуру экрана "Моя компания".
+
+    Parameters:
+        profile (dict): Профиль пользователя.
+
+    Returns:
+        tuple: Текст сообщения и клавиатура.
+    """
+    fields = {key: profile.get(key, NO_DATA) for key in
+              ("organization", "organization_adress", "organization_inn", "organization_phone")}
+    keyboard = my_company_keyboard(*(value != NO_DATA for value in fields.values()))
+    return MY_COMPANY_TEMPLATE(**fields), keyboard
+
+
+def duration(seconds, upper_bound=False):
+    """
+    Форматирует длительность в секундах: "45 мин", "3.5 ч", "2.0 дн".
+
+    Parameters:
+        seconds (float): Длительность (None - нет данных или больше недели при upper_bound).
+        upper_bound (bool): Значение - верхняя граница корзины (выводится с "≤").
+    """
+    if seconds is None:
+        return "> 7 дн" if upper_bound else NO_DATA
+    if seconds < 3600:
+        text = f"{seconds / 60:.0f} мин"
+    elif seconds < 86400:
+        text = f"{seconds / 3600:.1f} ч"
+    else:
+        text = f"{seconds / 86400:.1f} дн"
+    return f"≤ {text}" if upper_bound else text
+
+
+def _resolution_line(summary):
+    if not summary['count']:
+        return NO_DATA
+    return (f"медиана {duration(summary['median'], True)}, p90 {duration(summary['p90'], True)}, "
+            f"среднее {duration(summary['avg'])}")
+
+
+def stats_report(report, days):
+    """
+    Возвращает текст и клавиатуру экрана статистики.
+
+    Parameters:
+        report (dict): Результат analytics.get_report.
+        days (int): Длина периода в днях.
+
+    Returns:
+        tuple: Текст сообщения и клавиатура.
+    """
+    text = f"<b>📊 Статистика за {days} дн.</b>\n\n"
+    text += f"<b>📬 Создано:</b> {report['created']}   <b>📭 Завершено:</b> {report['completed']}\n"
+    text += f"<b>⏱ Время выполнения:</b> {_resolution_line(report['resolution'])}\n\n"
+
+    text += "<b>📅 По дням</b> (создано / завершено / в работе на конец дня)\n"
+    for day, created, completed, backlog in report['days'][-7:]:
+        text += f"<code>{day[5:]}</code>  {created} / {completed} / {backlog}\n"
+
+    if report['organizations']:
+        text += "\n<b>🏢 Организации</b>\n"
+        for organization, created, completed, average in report['organizations']:
+            text += f"{html.escape(organization or NO_DATA)}: {created} / {completed}, среднее {duration(average)}\n"
+
+    if report['moderators']:
+        text += "\n<b>🧑‍💻 Исполнители</b>\n"
+        for moderator, resolution in report['moderators']:
+            name = f"<a href='tg://user?id={moderator}'>{moderator}</a>" if moderator else "не указан"
+            text += f"{name}: {resolution['count']}, {_resolution_line(resolution)}\n"
+
+    if report['busiest_hours']:
+        hours = ', '.join(f"{hour:02d}:00 ({created})" for hour, created in report['busiest_hours'])
+        text += f"\n<b>🔥 Пиковые часы:</b> {hours}\n"
+
+    keyboard = _keyboard(
+        [(("• " if period == days else "") + f"{period} дн.", f"admin_stats_{period}") for period in STATS_PERIODS],
+        [("⬅️ Назад", "admin_panel")],
+    )
+    return text, keyboard
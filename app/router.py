@@ -0,0 +1,75 @@
+class Router:
+    """
+    Таблица маршрутизации строковых действий (callback_data кнопок или позиций пользователя).
+
+    Точные действия ищутся в словаре, действия с аргументами вида
+    '<префикс>_<арг1>_<арг2>' - по самому длинному зарегистрированному префиксу.
+    Стоимость поиска не зависит от количества зарегистрированных маршрутов.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._prefixes = {}
+
+    def add(self, action, handler):
+        """
+        Регистрирует обработчик точного действия.
+        """
+        self._exact[action] = handler
+
+    def add_prefix(self, prefix, handler):
+        """
+        Регистрирует обработчик действия с аргументами '<prefix>_<аргументы>'.
+        Аргументы передаются обработчику строками.
+        """
+        self._prefixes[prefix] = handler
+
+    def route(self, action):
+        """
+        Декоратор для регистрации обработчика точного действия.
+        """
+        def decorator(handler):
+            self.add(action, handler)
+            return handler
+        return decorator
+
+    def route_prefix(self, prefix):
+        """
+        Декоратор для регистрации обработчика действия с аргументами.
+        """
+        def decorator(handler):
+            self.add_prefix(prefix, handler)
+            return handler
+        return decorator
+
+    def resolve(self, action):
+        """
+        Находит обработчик действия.
+
+        Parameters:
+            action (str): Действие, например 'main_menu' или 'ticket_15'.
+
+        Returns:
+            tuple: Обработчик (или None) и список аргументов.
+        """
+        _, handler, args = self.lookup(action)
+        return handler, args
+
+    def lookup(self, action):
+        """
+        То же, что resolve, но дополнительно возвращает зарегистрированное имя
+        маршрута (действие или префикс) - например, для меток метрик.
+
+        Returns:
+            tuple: Имя маршрута (или None), обработчик (или None) и список аргументов.
+        """
+        handler = self._exact.get(action)
+        if handler is not None:
+            return action, handler, []
+        parts = action.split('_')
+        for i in range(len(parts) - 1, 0, -1):
+            prefix = '_'.join(parts[:i])
+            handler = self._prefixes.get(prefix)
+            if handler is not None:
+                return prefix, handler, parts[i:]
+        return None, None, []
@@ -1,11 +1,106 @@
 import sqlite3
+import datetime
 import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+from app.cache import TTLCache, MISSING
 
 DB_PATH = 'app/database.db'
 
+# Настройки соединения: WAL позволяет читать во время записи,
+# synchronous=NORMAL в режиме WAL не делает fsync на каждый коммит.
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -8000),
+    ('busy_timeout', 5000),
+)
+# Архив старых завершенных заявок: файл ARCHIVE_FILE рядом с основной базой,
+# подключаемый к каждому соединению как схема archive (ATTACH).
+ARCHIVE_FILE = 'archive.db'
+ARCHIVE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+)
+# Размер кэша подготовленных выражений на одно соединение
+CACHED_STATEMENTS = 256
+
+# Кэш декодированных записей пользователей (get_user_by_id, read_profile)
+USER_CACHE_SIZE = 5000
+USER_CACHE_TTL = 300
+_user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+# Увеличивается при close_connections, чтобы все потоки переоткрыли соединения
+_generation = 0
+
+
+def _open_connection(path):
+    """
+    Открывает новое соединение с базой данных и применяет PRAGMA-настройки.
+
+    Parameters:
+        path (str): Путь к файлу базы данных.
+
+    Returns:
+        sqlite3.Connection: Открытое соединение.
+    """
+    conn = sqlite3.connect(path, cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    conn.execute('ATTACH DATABASE ? AS archive', (os.path.join(os.path.dirname(path), ARCHIVE_FILE),))
+    for name, value in ARCHIVE_PRAGMAS:
+        conn.execute(f"PRAGMA archive.{name}={value}")
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
+
+def get_connection():
+    """
+    Возвращает долгоживущее соединение текущего потока.
+    Соединение открывается один раз и переиспользуется всеми запросами потока.
+
+    Returns:
+        sqlite3.Connection: Соединение с базой данных.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH or _local.generation != _generation:
+        conn = _open_connection(DB_PATH)
+        _local.conn = conn
+        _local.path = DB_PATH
+        _local.generation = _generation
+    return conn
+
+
+def close_connections():
+    """
+    Закрывает все открытые соединения (при остановке бота или смене DB_PATH).
+    """
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            if conn.in_transaction:
+                conn.commit()
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _user_cache.clear()
+
+
 def execute_query(query, params=None):
     """
-    Выполняет SQL-запрос к базе данных.
+    Выполняет SQL-запрос к базе данных через соединение текущего потока.
 
     Parameters:
         query (str): SQL-запрос.
@@ -14,14 +109,31 @@ def execute_query(query, params=None):
     Returns:
         list: Результат выполнения запроса.
     """
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+    conn = get_connection()
+    cursor = conn.execute(query, params or ())
+    result = cursor.fetchall()
+    if conn.in_transaction:
         conn.commit()
-        return cursor.fetchall()
+    return result
+
+@contextmanager
+def transaction():
+    """
+    Открывает транзакцию с блокировкой на запись (BEGIN IMMEDIATE) на соединении
+    текущего потока. Коммит при успешном выходе, откат при исключении.
+
+    Returns:
+        sqlite3.Connection: Соединение с открытой транзакцией.
+    """
+    conn = get_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
 
 def create_tables():
     """
@@ -49,6 +161,478 @@ def create_tables():
     '''
     execute_query(users)
     execute_query(ticket)
+    migrate()
+    with transaction() as conn:
+        _sync_archive_schema(conn)
+
+
+# Заявки основной таблицы и архива (для пересчетов и проверок). Копия в архиве,
+# оставшаяся после сбоя между копированием и удалением (см. archive_tickets),
+# не учитывается.
+ALL_TICKETS = '''(
+    SELECT * FROM main.ticket
+    UNION ALL
+    SELECT * FROM archive.ticket a
+    WHERE NOT EXISTS (SELECT 1 FROM main.ticket t WHERE t.number_ticket = a.number_ticket)
+)'''
+
+
+def _sync_archive_schema(conn):
+    """
+    Создает таблицу archive.ticket со столбцами ticket и добавляет в нее столбцы,
+    появившиеся в ticket после миграций. Порядок столбцов совпадает, поэтому
+    SELECT * из обеих таблиц можно объединять.
+
+    Parameters:
+        conn (sqlite3.Connection): Соединение с открытой транзакцией.
+    """
+    columns = conn.execute('PRAGMA main.table_info(ticket)').fetchall()
+    archived = conn.execute('PRAGMA archive.table_info(ticket)').fetchall()
+    if not archived:
+        definition = ', '.join(
+            f'{name} {column_type}' + (' PRIMARY KEY' if pk else '') for _, name, column_type, _, _, pk in columns)
+        conn.execute(f'CREATE TABLE archive.ticket ({definition})')
+    else:
+        for _, name, column_type, *_ in columns[len(archived):]:
+            conn.execute(f'ALTER TABLE archive.ticket ADD COLUMN {name} {column_type}')
+    conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_ticket_user_state ON ticket (tg_id_ticket, state_ticket)')
+    # Столбцы времени появляются в миграции 6 (база может быть создана и без нее)
+    names = [name for _, name, *_ in columns]
+    for column in ('created_at', 'completed_at'):
+        if column in names:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS archive.idx_ticket_{column} ON ticket ({column})')
+
+
+# tg_id строки ticket_counters с общими счетчиками по всем пользователям
+GLOBAL_COUNTER_ID = 0
+
+# Триггеры поддерживают ticket_counters в той же транзакции, что и изменение
+# ticket; строки с tg_id = 0 (GLOBAL_COUNTER_ID) хранят общие счетчики.
+# Как и в _fill_ticket_counters, заявки без статуса не учитываются,
+# а заявки без пользователя учитываются только в общих счетчиках.
+TICKET_COUNTER_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_insert AFTER INSERT ON ticket
+    WHEN NEW.state_ticket IS NOT NULL
+    BEGIN
+        INSERT INTO ticket_counters (tg_id, state_ticket, total) SELECT NEW.tg_id_ticket, NEW.state_ticket, 1
+            WHERE NEW.tg_id_ticket IS NOT NULL
+            ON CONFLICT (tg_id, state_ticket) DO UPDATE SET total = total + 1;
+        INSERT INTO ticket_counters (tg_id, state_ticket, total) VALUES (0, NEW.state_ticket, 1)
+            ON CONFLICT (tg_id, state_ticket) DO UPDATE SET total = total + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_update AFTER UPDATE OF tg_id_ticket, state_ticket ON ticket
+    WHEN OLD.tg_id_ticket IS NOT NEW.tg_id_ticket OR OLD.state_ticket IS NOT NEW.state_ticket
+    BEGIN
+        UPDATE ticket_counters SET total = total - 1
+            WHERE (tg_id = OLD.tg_id_ticket OR tg_id = 0) AND state_ticket = OLD.state_ticket;
+        INSERT INTO ticket_counters (tg_id, state_ticket, total) SELECT NEW.tg_id_ticket, NEW.state_ticket, 1
+            WHERE NEW.tg_id_ticket IS NOT NULL AND NEW.state_ticket IS NOT NULL
+            ON CONFLICT (tg_id, state_ticket) DO UPDATE SET total = total + 1;
+        INSERT INTO ticket_counters (tg_id, state_ticket, total) SELECT 0, NEW.state_ticket, 1
+            WHERE NEW.state_ticket IS NOT NULL
+            ON CONFLICT (tg_id, state_ticket) DO UPDATE SET total = total + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_delete AFTER DELETE ON ticket
+    WHEN OLD.state_ticket IS NOT NULL
+    BEGIN
+        UPDATE ticket_counters SET total = total - 1
+            WHERE (tg_id = OLD.tg_id_ticket OR tg_id = 0) AND state_ticket = OLD.state_ticket;
+    END
+    ''',
+)
+
+
+def _fill_ticket_counters(conn, source='ticket'):
+    """
+    Пересчитывает таблицу ticket_counters по таблице ticket.
+
+    Parameters:
+        conn (sqlite3.Connection): Соединение с открытой транзакцией.
+        source (str): Источник заявок (по умолчанию ticket, ALL_TICKETS - вместе с архивом).
+    """
+    conn.execute('DELETE FROM ticket_counters')
+    conn.execute(f'''
+        INSERT INTO ticket_counters (tg_id, state_ticket, total)
+        SELECT tg_id_ticket, state_ticket, COUNT(*) FROM {source}
+        WHERE state_ticket IS NOT NULL AND tg_id_ticket IS NOT NULL
+        GROUP BY tg_id_ticket, state_ticket
+    ''')
+    conn.execute(f'''
+        INSERT INTO ticket_counters (tg_id, state_ticket, total)
+        SELECT ?, state_ticket, COUNT(*) FROM {source}
+        WHERE state_ticket IS NOT NULL
+        GROUP BY state_ticket
+    ''', (GLOBAL_COUNTER_ID,))
+
+
+def _migrate_ticket_counter_triggers(conn):
+    # Пересоздание триггеров счетчиков с проверкой NULL и пересчет счетчиков
+    # вместе с архивом: прежние триггеры записывали строки с NULL. Схема архива
+    # синхронизируется заранее, чтобы столбцы ticket и archive.ticket совпадали.
+    for name in ('trg_ticket_counters_insert', 'trg_ticket_counters_update', 'trg_ticket_counters_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for trigger in TICKET_COUNTER_TRIGGERS:
+        conn.execute(trigger)
+    _sync_archive_schema(conn)
+    _fill_ticket_counters(conn, ALL_TICKETS)
+
+
+def _migrate_ticket_counters(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_counters (
+            tg_id INTEGER NOT NULL,
+            state_ticket TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tg_id, state_ticket)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in TICKET_COUNTER_TRIGGERS:
+        conn.execute(trigger)
+    _fill_ticket_counters(conn)
+
+
+# Часто читаемые поля профиля, хранящиеся в отдельных столбцах users.
+# Остальные поля профиля остаются в JSON-ячейке profile.
+PROFILE_COLUMNS = ('organization', 'organization_adress', 'organization_inn', 'organization_phone')
+
+
+def _migrate_profile_columns(conn):
+    for column in PROFILE_COLUMNS:
+        conn.execute(f'ALTER TABLE users ADD COLUMN {column} TEXT')
+    assignments = ', '.join(f"{column} = json_extract(profile, '$.{column}')" for column in PROFILE_COLUMNS)
+    paths = ', '.join(f"'$.{column}'" for column in PROFILE_COLUMNS)
+    conn.execute(f'''
+        UPDATE users SET {assignments}, profile = json_remove(profile, {paths})
+        WHERE json_valid(profile)
+    ''')
+
+
+# Полнотекстовый индекс заявок (FTS5 с внешним содержимым: текст хранится
+# только в ticket, индекс поддерживается триггерами).
+SEARCH_COLUMNS = ('message_ticket', 'ticket_comm', 'organization', 'addres_ticket')
+# Веса столбцов для bm25 в порядке SEARCH_COLUMNS
+SEARCH_WEIGHTS = (1.0, 1.0, 5.0, 2.0)
+# Больше совпадений не ранжируются по релевантности, а выводятся от новых к старым
+SEARCH_RANK_MAX = 1000
+# Маркеры совпадений в сниппете (заменяются на разметку при выводе)
+SEARCH_MARK_START = '\x02'
+SEARCH_MARK_END = '\x03'
+
+_search_columns = ', '.join(SEARCH_COLUMNS)
+_search_new = ', '.join(f'NEW.{column}' for column in SEARCH_COLUMNS)
+_search_old = ', '.join(f'OLD.{column}' for column in SEARCH_COLUMNS)
+TICKET_SEARCH_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_fts_insert AFTER INSERT ON ticket
+    BEGIN
+        INSERT INTO ticket_fts (rowid, {_search_columns}) VALUES (NEW.number_ticket, {_search_new});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_fts_delete AFTER DELETE ON ticket
+    BEGIN
+        INSERT INTO ticket_fts (ticket_fts, rowid, {_search_columns}) VALUES ('delete', OLD.number_ticket, {_search_old});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_fts_update AFTER UPDATE OF {_search_columns} ON ticket
+    BEGIN
+        INSERT INTO ticket_fts (ticket_fts, rowid, {_search_columns}) VALUES ('delete', OLD.number_ticket, {_search_old});
+        INSERT INTO ticket_fts (rowid, {_search_columns}) VALUES (NEW.number_ticket, {_search_new});
+    END
+    ''',
+)
+
+
+def _migrate_ticket_search(conn):
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5(
+            {_search_columns},
+            content='ticket', content_rowid='number_ticket',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    for trigger in TICKET_SEARCH_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute("INSERT INTO ticket_fts (ticket_fts) VALUES ('rebuild')")
+
+
+# Текстовое время заявки (локальное время сервера, как str(message.date))
+# в секунды Unix; SQL-выражение с одним параметром.
+EPOCH_FROM_TEXT = "CAST(strftime('%s', ?, 'utc') AS INTEGER)"
+
+
+def _migrate_ticket_timestamps(conn):
+    conn.execute('ALTER TABLE ticket ADD COLUMN created_at INTEGER')
+    conn.execute('ALTER TABLE ticket ADD COLUMN completed_at INTEGER')
+    # Время завершения старых заявок неизвестно и остается NULL
+    conn.execute("UPDATE ticket SET created_at = CAST(strftime('%s', time_ticket, 'utc') AS INTEGER)")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ticket_created_at ON ticket (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ticket_completed_at ON ticket (completed_at)')
+
+
+# Свертки для статистики, поддерживаемые триггерами при создании и завершении
+# заявок: ticket_stats_hourly - создано/завершено по часам (и по дням в сумме),
+# ticket_stats_daily - по дням и организациям (объем, суммарное время выполнения),
+# ticket_stats_resolution - распределение времени выполнения по дням, исполнителям
+# и корзинам длительности (для медианы и p90). Удаление заявок (архивация)
+# свертки не меняет - это история.
+# Верхние границы корзин времени выполнения в секундах (последняя корзина - больше недели)
+RESOLUTION_BUCKETS = (900, 1800, 3600, 7200, 14400, 28800, 86400, 172800, 259200, 604800)
+
+
+def _hour_sql(column):
+    return f"strftime('%Y-%m-%d %H', {column}, 'unixepoch', 'localtime')"
+
+
+def _day_sql(column):
+    return f"date({column}, 'unixepoch', 'localtime')"
+
+
+def _bucket_sql(seconds):
+    cases = ' '.join(f'WHEN {seconds} < {bound} THEN {i}' for i, bound in enumerate(RESOLUTION_BUCKETS))
+    return f'CASE {cases} ELSE {len(RESOLUTION_BUCKETS)} END'
+
+
+def _rollup_completion_sql(row, sign):
+    # Учет (sign = 1) или отмена учета (sign = -1) завершения заявки row (NEW или OLD)
+    day = _day_sql(f'{row}.completed_at')
+    resolution = f'{row}.completed_at - {row}.created_at'
+    resolved = f'({row}.created_at IS NOT NULL)'
+    return f'''
+        INSERT INTO ticket_stats_hourly (hour, created, completed) VALUES ({_hour_sql(f'{row}.completed_at')}, 0, {sign})
+            ON CONFLICT (hour) DO UPDATE SET completed = completed + {sign};
+        INSERT INTO ticket_stats_daily (day, organization, created, completed, resolved, resolution_total)
+            VALUES ({day}, COALESCE({row}.organization, ''), 0, {sign}, {sign} * {resolved}, {sign} * COALESCE({resolution}, 0))
+            ON CONFLICT (day, organization) DO UPDATE SET completed = completed + {sign},
+            resolved = resolved + excluded.resolved, resolution_total = resolution_total + excluded.resolution_total;
+        INSERT INTO ticket_stats_resolution (day, moderator, bucket, total, resolution_total)
+            SELECT {day}, COALESCE({row}.completed_by, 0), {_bucket_sql(resolution)}, {sign}, {sign} * ({resolution})
+            WHERE {row}.created_at IS NOT NULL
+            ON CONFLICT (day, moderator, bucket) DO UPDATE
+            SET total = total + excluded.total, resolution_total = resolution_total + excluded.resolution_total;
+    '''
+
+
+TICKET_ROLLUP_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_rollups_insert AFTER INSERT ON ticket
+    WHEN NEW.created_at IS NOT NULL
+    BEGIN
+        INSERT INTO ticket_stats_hourly (hour, created, completed) VALUES ({_hour_sql('NEW.created_at')}, 1, 0)
+            ON CONFLICT (hour) DO UPDATE SET created = created + 1;
+        INSERT INTO ticket_stats_daily (day, organization, created) VALUES ({_day_sql('NEW.created_at')}, COALESCE(NEW.organization, ''), 1)
+            ON CONFLICT (day, organization) DO UPDATE SET created = created + 1;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_rollups_complete AFTER UPDATE OF completed_at ON ticket
+    WHEN NEW.completed_at IS NOT NULL AND OLD.completed_at IS NOT NEW.completed_at
+    BEGIN
+        {_rollup_completion_sql('NEW', 1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_ticket_rollups_uncomplete AFTER UPDATE OF completed_at ON ticket
+    WHEN OLD.completed_at IS NOT NULL AND OLD.completed_at IS NOT NEW.completed_at
+    BEGIN
+        {_rollup_completion_sql('OLD', -1)}
+    END
+    ''',
+)
+
+
+def _fill_ticket_rollups(conn, source='ticket'):
+    """
+    Пересчитывает таблицы статистики по таблице ticket.
+
+    Parameters:
+        conn (sqlite3.Connection): Соединение с открытой транзакцией.
+        source (str): Источник заявок (по умолчанию ticket, ALL_TICKETS - вместе с архивом).
+    """
+    for table in ('ticket_stats_hourly', 'ticket_stats_daily', 'ticket_stats_resolution'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute(f'''
+        INSERT INTO ticket_stats_hourly (hour, created, completed)
+        SELECT {_hour_sql('created_at')}, COUNT(*), 0 FROM {source} WHERE created_at IS NOT NULL GROUP BY 1
+    ''')
+    conn.execute(f'''
+        INSERT INTO ticket_stats_hourly (hour, created, completed)
+        SELECT {_hour_sql('completed_at')}, 0, COUNT(*) FROM {source} WHERE completed_at IS NOT NULL GROUP BY 1
+        ON CONFLICT (hour) DO UPDATE SET completed = excluded.completed
+    ''')
+    conn.execute(f'''
+        INSERT INTO ticket_stats_daily (day, organization, created)
+        SELECT {_day_sql('created_at')}, COALESCE(organization, ''), COUNT(*) FROM {source}
+        WHERE created_at IS NOT NULL GROUP BY 1, 2
+    ''')
+    conn.execute(f'''
+        INSERT INTO ticket_stats_daily (day, organization, created, completed, resolved, resolution_total)
+        SELECT {_day_sql('completed_at')}, COALESCE(organization, ''), 0, COUNT(*),
+               COUNT(created_at), COALESCE(SUM(completed_at - created_at), 0)
+        FROM {source} WHERE completed_at IS NOT NULL GROUP BY 1, 2
+        ON CONFLICT (day, organization) DO UPDATE SET completed = excluded.completed,
+        resolved = excluded.resolved, resolution_total = excluded.resolution_total
+    ''')
+    conn.execute(f'''
+        INSERT INTO ticket_stats_resolution (day, moderator, bucket, total, resolution_total)
+        SELECT {_day_sql('completed_at')}, COALESCE(completed_by, 0),
+               {_bucket_sql('completed_at - created_at')}, COUNT(*), SUM(completed_at - created_at)
+        FROM {source} WHERE completed_at IS NOT NULL AND created_at IS NOT NULL GROUP BY 1, 2, 3
+    ''')
+
+
+def _migrate_ticket_rollups(conn):
+    conn.execute('ALTER TABLE ticket ADD COLUMN completed_by INTEGER')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_stats_hourly (
+            hour TEXT PRIMARY KEY,
+            created INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_stats_daily (
+            day TEXT NOT NULL,
+            organization TEXT NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            resolution_total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, organization)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_stats_resolution (
+            day TEXT NOT NULL,
+            moderator INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            resolution_total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, moderator, bucket)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in TICKET_ROLLUP_TRIGGERS:
+        conn.execute(trigger)
+    _fill_ticket_rollups(conn)
+
+
+# Миграции схемы. Номер миграции = позиция в списке + 1, текущая версия
+# хранится в PRAGMA user_version. Элемент списка - кортеж SQL-выражений
+# или функция, принимающая соединение. Новые миграции добавляются только в конец.
+MIGRATIONS = [
+    # 1: индексы для счетчиков и выборок заявок по пользователю и статусу
+    (
+        'CREATE INDEX IF NOT EXISTS idx_ticket_user_state ON ticket (tg_id_ticket, state_ticket)',
+        'CREATE INDEX IF NOT EXISTS idx_ticket_state_number ON ticket (state_ticket, number_ticket)',
+    ),
+    # 2: счетчики задач по пользователям и статусам, поддерживаемые триггерами
+    _migrate_ticket_counters,
+    # 3: индекс для очереди администратора с фильтром по организации
+    (
+        'CREATE INDEX IF NOT EXISTS idx_ticket_state_org_number ON ticket (state_ticket, organization, number_ticket)',
+    ),
+    # 4: поля компании из JSON-профиля переносятся в столбцы users
+    _migrate_profile_columns,
+    # 5: полнотекстовый поиск по заявкам
+    _migrate_ticket_search,
+    # 6: время создания и завершения заявок в секундах Unix
+    _migrate_ticket_timestamps,
+    # 7: исполнитель заявки и свертки для статистики
+    _migrate_ticket_rollups,
+    # 8: триггеры счетчиков пропускают заявки без пользователя или статуса
+    _migrate_ticket_counter_triggers,
+]
+
+
+def get_schema_version():
+    """
+    Возвращает текущую версию схемы базы данных.
+
+    Returns:
+        int: Значение PRAGMA user_version.
+    """
+    return execute_query('PRAGMA user_version')[0][0]
+
+
+def migrate():
+    """
+    Применяет к базе данных все миграции, которые еще не были применены.
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением версии.
+
+    Returns:
+        int: Версия схемы после миграции.
+    """
+    conn = get_connection()
+    version = get_schema_version()
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Миграцию мог уже применить другой процесс
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= number:
+                conn.rollback()
+                continue
+            if callable(migration):
+                migration(conn)
+            else:
+                for statement in migration:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version={number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+    return version
+
+
+def _profile_from_row(values, profile_json=None):
+    """
+    Собирает словарь профиля из столбцов PROFILE_COLUMNS и JSON-ячейки profile.
+
+    Parameters:
+        values (tuple): Значения столбцов в порядке PROFILE_COLUMNS.
+        profile_json (str): Остальные поля профиля в формате JSON (по умолчанию None).
+
+    Returns:
+        dict: Профиль пользователя.
+    """
+    profile = json.loads(profile_json) if profile_json else {}
+    for column, value in zip(PROFILE_COLUMNS, values):
+        if value is not None:
+            profile[column] = value
+    return profile
+
+
+def _update_profile(conn, tg_id, fields):
+    """
+    Обновляет несколько полей профиля одним UPDATE: поля из PROFILE_COLUMNS
+    записываются в столбцы, остальные - в JSON через json_set без разбора в Python.
+
+    Parameters:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        tg_id (int): Telegram ID пользователя.
+        fields (dict): Поля профиля и их новые значения.
+    """
+    assignments = []
+    params = []
+    extra_paths = []
+    for field_name, value in fields.items():
+        if field_name in PROFILE_COLUMNS:
+            assignments.append(f'{field_name} = ?')
+            params.append(value)
+        else:
+            extra_paths.append('?, ?')
+            params += [f'$."{field_name}"', value]
+    if extra_paths:
+        assignments.append(f"profile = json_set(COALESCE(profile, '{{}}'), {', '.join(extra_paths)})")
+    if assignments:
+        conn.execute(f"UPDATE users SET {', '.join(assignments)} WHERE tg_id = ?", params + [tg_id])
 
 
 def add_user(tg_id, pos, data_reg, profile):
@@ -61,14 +645,39 @@ def add_user(tg_id, pos, data_reg, profile):
         data_reg (str): Дата регистрации пользователя.
         profile (dict): Профиль пользователя в формате словаря.
     """
-    query = '''INSERT INTO users (tg_id, pos, data_reg, profile) VALUES (?, ?, ?, ?)'''
-    profile_json = json.dumps(profile, ensure_ascii=False)
-    execute_query(query, (tg_id, pos, data_reg, profile_json))
+    extras = {key: value for key, value in profile.items() if key not in PROFILE_COLUMNS}
+    columns = ', '.join(PROFILE_COLUMNS)
+    query = f'''INSERT INTO users (tg_id, pos, data_reg, profile, {columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+    profile_json = json.dumps(extras, ensure_ascii=False)
+    execute_query(query, (tg_id, pos, data_reg, profile_json, *(profile.get(column) for column in PROFILE_COLUMNS)))
+    _user_cache.invalidate(tg_id)
+
+
+def _load_user(tg_id):
+    """
+    Возвращает запись пользователя из кэша, при промахе читает ее из базы.
+    Возвращаемый словарь общий с кэшем и не должен изменяться.
+    """
+    user = _user_cache.get(tg_id)
+    if user is not MISSING:
+        return user
+    query = f"SELECT tg_id, pos, data_reg, profile, {', '.join(PROFILE_COLUMNS)} FROM users WHERE tg_id=?"
+    result = execute_query(query, (tg_id,))
+    if not result:
+        return None
+    user = {
+        'tg_id': result[0][0],
+        'pos': result[0][1],
+        'data_reg': result[0][2],
+        'profile': _profile_from_row(result[0][4:], result[0][3])
+    }
+    _user_cache.put(tg_id, user)
+    return user
 
 
 def get_user_by_id(tg_id):
     """
-    Возвращает информацию о пользователе по его Telegram ID.
+    Возвращает информацию о пользователе по его Telegram ID (с кэшированием).
 
     Parameters:
         tg_id (int): Telegram ID пользователя.
@@ -76,16 +685,20 @@ def get_user_by_id(tg_id):
     Returns:
         dict: Информация о пользователе.
     """
-    query = 'SELECT * FROM users WHERE tg_id=?'
-    result = execute_query(query, (tg_id,))
-    if result:
-        return {
-            'tg_id': result[0][0],
-            'pos': result[0][1],
-            'data_reg': result[0][2],
-            'profile': json.loads(result[0][3])
-        }
-    return None
+    user = _load_user(tg_id)
+    if user is None:
+        return None
+    return dict(user, profile=dict(user['profile']))
+
+
+def get_user_cache_stats():
+    """
+    Возвращает статистику кэша пользователей для подбора его размера.
+
+    Returns:
+        dict: Размер, попадания, промахи, доля попаданий, вытеснения и истечения.
+    """
+    return _user_cache.stats()
 
 
 def add_ticket(tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm):
@@ -101,11 +714,42 @@ def add_ticket(tg_id_ticket, organization, addres_ticket, message_ticket, time_t
         state_ticket (str): Статус задачи.
         ticket_comm (str): Комментарий к задаче.
     """
-    query = '''
-        INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+    query = f'''
+        INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, {EPOCH_FROM_TEXT})
     '''
-    execute_query(query, (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm))
+    execute_query(query, (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm, time_ticket))
+
+
+def create_ticket(tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, user_name):
+    """
+    Создает задачу со статусом "В работе" и обновляет профиль пользователя
+    (номер и дата последней задачи, имя пользователя) в одной транзакции.
+
+    Parameters:
+        tg_id_ticket (int): Telegram ID пользователя, создавшего задачу.
+        organization (str): Название организации.
+        addres_ticket (str): Адрес задачи.
+        message_ticket (str): Сообщение задачи.
+        time_ticket (str): Время создания задачи.
+        user_name (str): Имя пользователя в Telegram.
+
+    Returns:
+        int: Номер созданной задачи.
+    """
+    with transaction() as conn:
+        cursor = conn.execute(f'''
+            INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, {EPOCH_FROM_TEXT})
+        ''', (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, "В работе", "", time_ticket))
+        ticket_id = cursor.lastrowid
+        _update_profile(conn, tg_id_ticket, {
+            'history_ticket': str(ticket_id),
+            'data_ticket': str(time_ticket),
+            'user_name': str(user_name),
+        })
+    _user_cache.invalidate(tg_id_ticket)
+    return ticket_id
 
 
 def get_last_ticket_number():
@@ -131,7 +775,7 @@ def get_total_tickets_by_status(tg_id, status):
     Returns:
         int: Общее количество задач с указанным статусом.
     """
-    query = 'SELECT COUNT(*) FROM ticket WHERE tg_id_ticket=? AND state_ticket=?'
+    query = 'SELECT total FROM ticket_counters WHERE tg_id=? AND state_ticket=?'
     result = execute_query(query, (tg_id, status))
     return result[0][0] if result else 0
 
@@ -146,9 +790,7 @@ def get_total_tickets_by_status_admin(status):
     Returns:
         int: Общее количество задач с указанным статусом.
     """
-    query = 'SELECT COUNT(*) FROM ticket WHERE state_ticket=?'
-    result = execute_query(query, (status,))
-    return result[0][0] if result else 0
+    return get_total_tickets_by_status(GLOBAL_COUNTER_ID, status)
 
 
 def get_total_tickets_by_status_for_user(tg_id, status):
@@ -166,6 +808,99 @@ def get_total_tickets_by_status_for_user(tg_id, status):
     return str(total_tickets) if total_tickets else "0"
 
 
+def get_user_dashboard(tg_id):
+    """
+    Возвращает данные главного меню пользователя за один запрос:
+    поля компании из PROFILE_COLUMNS (без разбора JSON) и количество
+    открытых и закрытых задач из ticket_counters.
+
+    Parameters:
+        tg_id (int): Telegram ID пользователя.
+
+    Returns:
+        dict: Профиль и счетчики задач или None, если пользователя нет.
+    """
+    query = f'''
+        SELECT COALESCE((SELECT total FROM ticket_counters WHERE tg_id = u.tg_id AND state_ticket = ?), 0),
+               COALESCE((SELECT total FROM ticket_counters WHERE tg_id = u.tg_id AND state_ticket = ?), 0),
+               {', '.join(PROFILE_COLUMNS)}
+        FROM users u
+        WHERE u.tg_id = ?
+    '''
+    result = execute_query(query, ("В работе", "Завершена", tg_id))
+    if not result:
+        return None
+    return {
+        'profile': _profile_from_row(result[0][2:]),
+        'open_tickets': result[0][0],
+        'closed_tickets': result[0][1],
+    }
+
+
+def get_admin_dashboard():
+    """
+    Возвращает данные тикет меню администратора за один запрос:
+    общее количество задач в работе и завершенных задач.
+
+    Returns:
+        dict: Счетчики задач по статусам.
+    """
+    query = '''
+        SELECT COALESCE((SELECT total FROM ticket_counters WHERE tg_id = ? AND state_ticket = ?), 0),
+               COALESCE((SELECT total FROM ticket_counters WHERE tg_id = ? AND state_ticket = ?), 0)
+    '''
+    result = execute_query(query, (GLOBAL_COUNTER_ID, "В работе", GLOBAL_COUNTER_ID, "Завершена"))[0]
+    return {'open_tickets': result[0], 'closed_tickets': result[1]}
+
+
+def check_ticket_counters():
+    """
+    Сравнивает ticket_counters с фактическим количеством задач в таблице ticket и архиве.
+
+    Returns:
+        list: Список расхождений (tg_id, state_ticket, в счетчике, фактически).
+    """
+    query = f'''
+        WITH tickets AS {ALL_TICKETS},
+        actual AS (
+            SELECT tg_id_ticket AS tg_id, state_ticket, COUNT(*) AS total FROM tickets
+            WHERE state_ticket IS NOT NULL AND tg_id_ticket IS NOT NULL
+            GROUP BY tg_id_ticket, state_ticket
+            UNION ALL
+            SELECT ?, state_ticket, COUNT(*) FROM tickets
+            WHERE state_ticket IS NOT NULL
+            GROUP BY state_ticket
+        ),
+        keys AS (
+            SELECT tg_id, state_ticket FROM actual
+            UNION
+            SELECT tg_id, state_ticket FROM ticket_counters
+        )
+        SELECT k.tg_id, k.state_ticket, COALESCE(c.total, 0), COALESCE(a.total, 0)
+        FROM keys k
+        LEFT JOIN ticket_counters c ON c.tg_id = k.tg_id AND c.state_ticket = k.state_ticket
+        LEFT JOIN actual a ON a.tg_id = k.tg_id AND a.state_ticket = k.state_ticket
+        WHERE COALESCE(c.total, 0) != COALESCE(a.total, 0)
+    '''
+    return execute_query(query, (GLOBAL_COUNTER_ID,))
+
+
+def rebuild_ticket_counters():
+    """
+    Полностью пересчитывает ticket_counters по заявкам и архиву (восстановление после сбоя).
+    """
+    with transaction() as conn:
+        _fill_ticket_counters(conn, ALL_TICKETS)
+
+
+def rebuild_ticket_rollups():
+    """
+    Полностью пересчитывает таблицы статистики по заявкам и архиву (восстановление после сбоя).
+    """
+    with transaction() as conn:
+        _fill_ticket_rollups(conn, ALL_TICKETS)
+
+
 def get_tickets_in_progress_by_user_id(tg_id):
     """
     Возвращает список задач в работе для указанного пользователя.
@@ -195,11 +930,63 @@ def update_pos(pos_value, column, value):
     """
     query = f"UPDATE users SET pos = ? WHERE {column} = ?"
     execute_query(query, (pos_value, value))
+    if column == 'tg_id':
+        _user_cache.invalidate(value)
+    else:
+        _user_cache.clear()
+
+
+def read_pos(tg_id):
+    """
+    Возвращает позицию пользователя.
+
+    Parameters:
+        tg_id (int): Telegram ID пользователя.
+
+    Returns:
+        str: Позиция пользователя или None, если пользователя нет.
+    """
+    result = execute_query('SELECT pos FROM users WHERE tg_id=?', (tg_id,))
+    return result[0][0] if result else None
+
+
+def update_positions(positions):
+    """
+    Записывает позиции нескольких пользователей одной транзакцией.
+
+    Parameters:
+        positions (dict): Позиции пользователей в виде {tg_id: pos}.
+
+    Returns:
+        None
+    """
+    with transaction() as conn:
+        conn.executemany('UPDATE users SET pos = ? WHERE tg_id = ?',
+                         [(pos, tg_id) for tg_id, pos in positions.items()])
+    for tg_id in positions:
+        _user_cache.invalidate(tg_id)
+
+
+def update_profile(tg_id, **fields):
+    """
+    Обновляет несколько полей профиля пользователя одним запросом.
+
+    Parameters:
+        tg_id (int): Telegram ID пользователя.
+        **fields: Поля профиля и их новые значения.
+
+    Returns:
+        None
+    """
+    conn = get_connection()
+    with conn:
+        _update_profile(conn, tg_id, fields)
+    _user_cache.invalidate(tg_id)
 
 
 def update_profile_data(tg_id, field_name, new_value):
     """
-    Обновляет данные профиля пользователя внутри ячейки profile.
+    Обновляет одно поле профиля пользователя.
 
     Parameters:
         tg_id (int): Telegram ID пользователя.
@@ -209,13 +996,7 @@ def update_profile_data(tg_id, field_name, new_value):
     Returns:
         None
     """
-    query_select = 'SELECT profile FROM users WHERE tg_id=?'
-    profile_json = execute_query(query_select, (tg_id,))[0][0]
-    if profile_json:
-        profile_dict = json.loads(profile_json)
-        profile_dict[field_name] = new_value
-        query_update = "UPDATE users SET profile = ? WHERE tg_id = ?"
-        execute_query(query_update, (json.dumps(profile_dict, ensure_ascii=False), tg_id))
+    update_profile(tg_id, **{field_name: new_value})
 
 
 def read_cell(column, condition_column, condition_value):
@@ -237,7 +1018,8 @@ def read_cell(column, condition_column, condition_value):
 
 def read_profile(tg_id):
     """
-    Возвращает данные профиля пользователя из ячейки profile.
+    Возвращает данные профиля пользователя (столбцы компании и ячейка profile)
+    из кэша пользователей.
 
     Parameters:
         tg_id (int): Telegram ID пользователя.
@@ -245,11 +1027,10 @@ def read_profile(tg_id):
     Returns:
         dict: Данные профиля пользователя.
     """
-    query = "SELECT profile FROM users WHERE tg_id=?"
-    result = execute_query(query, (tg_id,))
-    if result:
-        return json.loads(result[0][0])
-    return None
+    user = _load_user(tg_id)
+    if user is None:
+        return None
+    return dict(user['profile'])
 
 
 def get_all_tickets_in_progress():
@@ -259,17 +1040,62 @@ def get_all_tickets_in_progress():
     Returns:
         list: Список кортежей с данными о тикетах.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM ticket WHERE state_ticket=?', ("В работе",))
-    all_tickets_in_progress = cursor.fetchall()
-    conn.close()
-    return all_tickets_in_progress
+    query = 'SELECT * FROM ticket WHERE state_ticket=?'
+    return execute_query(query, ("В работе",))
+
+
+def get_tickets_in_progress_page(cursor=None, newest_first=False, organization_ticket=None, limit=10):
+    """
+    Возвращает страницу очереди тикетов в работе с keyset-пагинацией.
+
+    Parameters:
+        cursor (int): Номер последнего тикета предыдущей страницы (по умолчанию None).
+        newest_first (bool): Сортировать от новых к старым (по умолчанию от старых к новым).
+        organization_ticket (int): Номер тикета, по организации которого фильтруется очередь.
+        limit (int): Размер страницы (по умолчанию 10).
+
+    Returns:
+        tuple: Список кортежей (number_ticket, time_ticket, organization)
+            и флаг наличия следующей страницы.
+    """
+    query = 'SELECT number_ticket, time_ticket, organization FROM ticket WHERE state_ticket=?'
+    params = ["В работе"]
+    if organization_ticket:
+        query += ' AND organization = (SELECT organization FROM ticket WHERE number_ticket=?)'
+        params.append(organization_ticket)
+    if cursor:
+        query += ' AND number_ticket < ?' if newest_first else ' AND number_ticket > ?'
+        params.append(cursor)
+    query += ' ORDER BY number_ticket DESC' if newest_first else ' ORDER BY number_ticket ASC'
+    query += ' LIMIT ?'
+    params.append(limit + 1)
+    tickets = execute_query(query, params)
+    return tickets[:limit], len(tickets) > limit
+
+
+def get_organizations_in_progress(limit=10):
+    """
+    Возвращает организации с тикетами в работе, отсортированные по их количеству.
+
+    Parameters:
+        limit (int): Максимальное количество организаций (по умолчанию 10).
+
+    Returns:
+        list: Список кортежей (organization, номер самого старого тикета, количество тикетов).
+    """
+    query = '''
+        SELECT organization, MIN(number_ticket), COUNT(*) FROM ticket
+        WHERE state_ticket=?
+        GROUP BY organization
+        ORDER BY COUNT(*) DESC
+        LIMIT ?
+    '''
+    return execute_query(query, ("В работе", limit))
 
 
 def get_ticket_info(ticket_id):
     """
-    Возвращает информацию о заданном тикете.
+    Возвращает информацию о заданном тикете (из основной таблицы или архива).
 
     Parameters:
         ticket_id (int): Номер тикета.
@@ -277,17 +1103,16 @@ def get_ticket_info(ticket_id):
     Returns:
         tuple: Кортеж с данными о тикете.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM ticket WHERE number_ticket=?', (ticket_id,))
-    ticket_info = cursor.fetchone()
-    conn.close()
-    return ticket_info
+    query = 'SELECT * FROM main.ticket WHERE number_ticket=? UNION ALL SELECT * FROM archive.ticket WHERE number_ticket=? LIMIT 1'
+    result = execute_query(query, (ticket_id, ticket_id))
+    return result[0] if result else None
 
 
 def update_ticket_status(ticket_id, new_status):
     """
-    Обновляет статус заданного тикета.
+    Обновляет статус заданного тикета. При статусе "Завершена" записывает
+    время завершения (у уже завершенного тикета оно не меняется), при любом
+    другом - сбрасывает время завершения и исполнителя.
 
     Parameters:
         ticket_id (int): Номер тикета.
@@ -296,12 +1121,244 @@ def update_ticket_status(ticket_id, new_status):
     Returns:
         None
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    query = "UPDATE ticket SET state_ticket=? WHERE number_ticket=?"
-    cursor.execute(query, (new_status, ticket_id))
-    conn.commit()
-    conn.close()
+    query = '''
+        UPDATE ticket SET state_ticket=:status,
+            completed_at = CASE WHEN :status = 'Завершена' THEN
+                CASE WHEN state_ticket = 'Завершена' THEN COALESCE(completed_at, CAST(strftime('%s', 'now') AS INTEGER))
+                     ELSE CAST(strftime('%s', 'now') AS INTEGER) END
+            END,
+            completed_by = CASE WHEN :status = 'Завершена' THEN completed_by END
+        WHERE number_ticket=:ticket_id
+    '''
+    execute_query(query, {'status': new_status, 'ticket_id': ticket_id})
+
+
+def complete_ticket(ticket_id, completed_by=None):
+    """
+    Завершает тикет, если он еще "В работе". Повторный вызов (двойное нажатие,
+    повторная доставка обновления) ничего не меняет.
+
+    Parameters:
+        ticket_id (int): Номер тикета.
+        completed_by (int): Telegram ID исполнителя (по умолчанию не указан).
+
+    Returns:
+        tuple: Данные завершенного тикета (столбцы ticket и последним элементом время
+            выполнения в секундах или None, если время создания неизвестно) или None,
+            если тикет не найден или уже завершен.
+    """
+    with transaction() as conn:
+        cursor = conn.execute('''
+            UPDATE ticket SET state_ticket=?, completed_at=CAST(strftime('%s', 'now') AS INTEGER), completed_by=?
+            WHERE number_ticket=? AND state_ticket=?
+        ''', ("Завершена", completed_by, ticket_id, "В работе"))
+        if cursor.rowcount != 1:
+            return None
+        return conn.execute(
+            'SELECT *, completed_at - created_at FROM ticket WHERE number_ticket=?', (ticket_id,)).fetchone()
+
+
+def _epoch(value):
+    """
+    Приводит время (datetime или секунды Unix) к целым секундам Unix.
+    """
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+# Столбцы времени, по которым доступны выборки за период
+PERIOD_COLUMNS = ('created_at', 'completed_at')
+
+
+def get_tickets_by_period(start, end, column='created_at', state=None, cursor=None, limit=100):
+    """
+    Возвращает заявки, созданные (или завершенные) в интервале [start, end),
+    вместе с архивом, с keyset-пагинацией по индексу времени.
+
+    Parameters:
+        start (datetime | int): Начало интервала.
+        end (datetime | int): Конец интервала (не включается).
+        column (str): 'created_at' или 'completed_at' (по умолчанию 'created_at').
+        state (str): Фильтр по статусу (по умолчанию все статусы).
+        cursor (tuple): (время, номер) последней заявки предыдущей страницы.
+        limit (int): Размер страницы (по умолчанию 100).
+
+    Returns:
+        tuple: Список кортежей (number_ticket, tg_id_ticket, organization, state_ticket,
+            created_at, completed_at) по возрастанию времени и флаг наличия следующей страницы.
+    """
+    if column not in PERIOD_COLUMNS:
+        raise ValueError(f"Неизвестный столбец времени: {column}")
+    condition = f'{column} >= ? AND {column} < ?'
+    params = [_epoch(start), _epoch(end)]
+    if state:
+        condition += ' AND state_ticket = ?'
+        params.append(state)
+    if cursor:
+        condition += f' AND ({column}, number_ticket) > (?, ?)'
+        params.extend(cursor)
+    columns = 'number_ticket, tg_id_ticket, organization, state_ticket, created_at, completed_at'
+    # UNION, а не UNION ALL: копия, оставшаяся в архиве после сбоя архивации, совпадает с заявкой
+    query = f'''
+        SELECT {columns} FROM main.ticket WHERE {condition}
+        UNION
+        SELECT {columns} FROM archive.ticket WHERE {condition}
+        ORDER BY {column}, number_ticket LIMIT ?
+    '''
+    tickets = execute_query(query, params * 2 + [limit + 1])
+    return tickets[:limit], len(tickets) > limit
+
+
+def get_resolution_stats(start, end):
+    """
+    Считает время выполнения заявок, завершенных в интервале [start, end), вместе с архивом.
+
+    Parameters:
+        start (datetime | int): Начало интервала.
+        end (datetime | int): Конец интервала (не включается).
+
+    Returns:
+        dict: Количество заявок и среднее, минимальное и максимальное время выполнения в секундах
+            (None, если заявок нет).
+    """
+    condition = 'completed_at >= ? AND completed_at < ? AND created_at IS NOT NULL'
+    query = f'''
+        SELECT COUNT(*), AVG(seconds), MIN(seconds), MAX(seconds) FROM (
+            SELECT number_ticket, completed_at - created_at AS seconds FROM main.ticket WHERE {condition}
+            UNION
+            SELECT number_ticket, completed_at - created_at FROM archive.ticket WHERE {condition}
+        )
+    '''
+    count, average, minimum, maximum = execute_query(query, (_epoch(start), _epoch(end)) * 2)[0]
+    return {'count': count, 'avg': average, 'min': minimum, 'max': maximum}
+
+
+# Столбцы выгрузки заявок: имя и выражение (время создания и завершения - местное)
+EXPORT_COLUMNS = (
+    ('number_ticket', 'number_ticket'),
+    ('tg_id', 'tg_id_ticket'),
+    ('organization', 'organization'),
+    ('address', 'addres_ticket'),
+    ('message', 'message_ticket'),
+    ('state', 'state_ticket'),
+    ('comment', 'ticket_comm'),
+    ('created_at', "COALESCE(datetime(created_at, 'unixepoch', 'localtime'), time_ticket)"),
+    ('completed_at', "datetime(completed_at, 'unixepoch', 'localtime')"),
+    ('completed_by', 'completed_by'),
+)
+
+
+def iter_tickets(start=None, end=None, state=None, organization=None, batch_size=1000):
+    """
+    Генератор заявок (вместе с архивом) для выгрузки: строки читаются курсором
+    пачками по batch_size, не загружая всю выборку в память. Порядок - порядок
+    хранения (без сортировки). Генератор использует соединение своего потока.
+
+    Parameters:
+        start (datetime | int): Созданные не раньше (по умолчанию без ограничения).
+        end (datetime | int): Созданные раньше (не включается, по умолчанию без ограничения).
+        state (str): Фильтр по статусу (по умолчанию все статусы).
+        organization (str): Фильтр по организации (по умолчанию все).
+        batch_size (int): Размер пачки чтения (по умолчанию 1000).
+
+    Yields:
+        tuple: Значения столбцов EXPORT_COLUMNS.
+    """
+    conditions, params = [], []
+    if start is not None:
+        conditions.append('created_at >= ?')
+        params.append(_epoch(start))
+    if end is not None:
+        conditions.append('created_at < ?')
+        params.append(_epoch(end))
+    if state:
+        conditions.append('state_ticket = ?')
+        params.append(state)
+    if organization:
+        conditions.append('organization = ?')
+        params.append(organization)
+    query = f'SELECT {", ".join(expression for _, expression in EXPORT_COLUMNS)} FROM {ALL_TICKETS}'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    cursor = get_connection().execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def archive_tickets(before, limit=500):
+    """
+    Переносит в архив (archive.ticket) пачку завершенных заявок, завершенных раньше before,
+    начиная со старых. Заявки копируются и удаляются из ticket двумя короткими транзакциями:
+    в режиме WAL коммит в две базы не атомарен, поэтому сначала фиксируется копия.
+    Удаляются только заявки, не изменившиеся после копирования; копии измененных
+    удаляются из архива. Счетчики ticket_counters по-прежнему учитывают архивные заявки,
+    свертки статистики удаление не меняет.
+
+    Parameters:
+        before (datetime | int): Граница времени завершения (или создания, если время завершения неизвестно).
+        limit (int): Размер пачки (по умолчанию 500).
+
+    Returns:
+        int: Количество перенесенных заявок (меньше limit - переносить больше нечего).
+    """
+    with transaction() as conn:
+        numbers = [row[0] for row in conn.execute('''
+            SELECT number_ticket FROM main.ticket
+            WHERE state_ticket=? AND COALESCE(completed_at, created_at) < ?
+            ORDER BY number_ticket LIMIT ?
+        ''', ("Завершена", _epoch(before), limit))]
+        if not numbers:
+            return 0
+        placeholders = ', '.join('?' * len(numbers))
+        conn.execute(f'INSERT OR REPLACE INTO archive.ticket SELECT * FROM main.ticket WHERE number_ticket IN ({placeholders})',
+                     numbers)
+
+    with transaction() as conn:
+        columns = [row[1] for row in conn.execute('PRAGMA main.table_info(ticket)')]
+        same = ' AND '.join(f't.{column} IS a.{column}' for column in columns)
+        archived = [row[0] for row in conn.execute(f'''
+            SELECT t.number_ticket FROM main.ticket t JOIN archive.ticket a ON a.number_ticket = t.number_ticket
+            WHERE t.number_ticket IN ({placeholders}) AND {same}
+        ''', numbers)]
+        changed = sorted(set(numbers) - set(archived))
+        if changed:
+            conn.execute(f'DELETE FROM archive.ticket WHERE number_ticket IN ({", ".join("?" * len(changed))})', changed)
+        if not archived:
+            return 0
+        placeholders = ', '.join('?' * len(archived))
+        conn.execute(f'DELETE FROM main.ticket WHERE number_ticket IN ({placeholders})', archived)
+        # Триггер удаления уменьшил счетчики: архивные заявки в них остаются
+        conn.execute(f'''
+            INSERT INTO ticket_counters (tg_id, state_ticket, total)
+            SELECT tg_id_ticket, state_ticket, COUNT(*) FROM archive.ticket
+            WHERE number_ticket IN ({placeholders}) AND tg_id_ticket IS NOT NULL AND state_ticket IS NOT NULL
+            GROUP BY tg_id_ticket, state_ticket
+            UNION ALL
+            SELECT ?, state_ticket, COUNT(*) FROM archive.ticket
+            WHERE number_ticket IN ({placeholders}) AND state_ticket IS NOT NULL
+            GROUP BY state_ticket
+            ON CONFLICT (tg_id, state_ticket) DO UPDATE SET total = total + excluded.total
+        ''', archived + [GLOBAL_COUNTER_ID] + archived)
+    return len(archived)
+
+
+def get_archive_stats():
+    """
+    Возвращает количество заявок в основной таблице и в архиве.
+
+    Returns:
+        dict: Количество заявок 'hot' и 'archived'.
+    """
+    query = 'SELECT (SELECT COUNT(*) FROM main.ticket), (SELECT COUNT(*) FROM archive.ticket)'
+    hot, archived = execute_query(query)[0]
+    return {'hot': hot, 'archived': archived}
 
 
 def get_completed_tickets_by_user(tg_id):
@@ -314,12 +1371,44 @@ def get_completed_tickets_by_user(tg_id):
     Returns:
         list: Список кортежей с данными о завершенных тикетах.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM ticket WHERE tg_id_ticket=? AND state_ticket=?', (tg_id, "Завершена"))
-    completed_tickets = cursor.fetchall()
-    conn.close()
-    return completed_tickets
+    query = 'SELECT * FROM ticket WHERE tg_id_ticket=? AND state_ticket=?'
+    return execute_query(query, (tg_id, "Завершена"))
+
+
+def get_completed_tickets_page(tg_id, before=None, after=None, limit=4):
+    """
+    Возвращает страницу завершенных тикетов пользователя (от новых к старым,
+    вместе с архивом) с keyset-пагинацией по номеру тикета и их общее количество.
+
+    Parameters:
+        tg_id (int): Telegram ID пользователя.
+        before (int): Вернуть тикеты с номером меньше указанного (следующая страница).
+        after (int): Вернуть тикеты с номером больше указанного (предыдущая страница).
+        limit (int): Размер страницы (по умолчанию 4).
+
+    Returns:
+        tuple: Список кортежей (number_ticket, time_ticket, message_ticket, ticket_comm)
+            и общее количество завершенных тикетов пользователя.
+    """
+    condition = 'tg_id_ticket=? AND state_ticket=?'
+    params = [tg_id, "Завершена"]
+    if after is not None:
+        condition += ' AND number_ticket > ?'
+        params.append(after)
+    elif before is not None:
+        condition += ' AND number_ticket < ?'
+        params.append(before)
+    # UNION, а не UNION ALL: копия, оставшаяся в архиве после сбоя архивации, совпадает с заявкой
+    query = f'''
+        SELECT number_ticket, time_ticket, message_ticket, ticket_comm FROM main.ticket WHERE {condition}
+        UNION
+        SELECT number_ticket, time_ticket, message_ticket, ticket_comm FROM archive.ticket WHERE {condition}
+        ORDER BY number_ticket {'ASC' if after is not None else 'DESC'} LIMIT ?
+    '''
+    tickets = execute_query(query, params * 2 + [limit])
+    if after is not None:
+        tickets.reverse()
+    return tickets, get_total_tickets_by_status(tg_id, "Завершена")
 
 
 def update_ticket_comment(ticket_id, ticket_comm):
@@ -340,7 +1429,7 @@ def update_ticket_comment(ticket_id, ticket_comm):
 
 def read_ticket_comment(ticket_id):
     """
-    Читает комментарий из существующего тикета.
+    Читает комментарий из существующего тикета (из основной таблицы или архива).
 
     Parameters:
         ticket_id (int): Номер тикета.
@@ -348,9 +1437,60 @@ def read_ticket_comment(ticket_id):
     Returns:
         str: Комментарий к тикету.
     """
-    query = 'SELECT ticket_comm FROM ticket WHERE number_ticket = ?'
-    result = execute_query(query, (ticket_id,))
+    query = '''
+        SELECT ticket_comm FROM main.ticket WHERE number_ticket = ?
+        UNION ALL
+        SELECT ticket_comm FROM archive.ticket WHERE number_ticket = ?
+        LIMIT 1
+    '''
+    result = execute_query(query, (ticket_id, ticket_id))
     if result:
         return result[0][0]
     else:
-        return None
\ No newline at end of file
+        return None
+
+
+def _search_match(text):
+    """
+    Превращает введенный текст в запрос FTS5: все слова должны встретиться,
+    каждое слово ищется по префиксу. Служебный синтаксис FTS5 не пропускается.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def search_tickets(text, offset=0, limit=10):
+    """
+    Ищет заявки по тексту, комментарию, организации и адресу.
+
+    Если совпадений не больше SEARCH_RANK_MAX, результаты упорядочены по
+    релевантности (bm25), иначе - от новых к старым: ранжирование тысяч
+    совпадений дорого и мало полезно. Страницы задаются смещением.
+
+    Parameters:
+        text (str): Поисковая строка.
+        offset (int): Сколько результатов пропустить (по умолчанию 0).
+        limit (int): Размер страницы (по умолчанию 10).
+
+    Returns:
+        tuple: Список кортежей (number_ticket, time_ticket, organization, state_ticket, сниппет
+            с маркерами SEARCH_MARK_START/SEARCH_MARK_END) и общее количество совпадений.
+    """
+    match = _search_match(text)
+    if not match:
+        return [], 0
+    total = execute_query('SELECT COUNT(*) FROM ticket_fts WHERE ticket_fts MATCH ?', (match,))[0][0]
+    if total <= offset:
+        return [], total
+    if total <= SEARCH_RANK_MAX:
+        order = f"bm25(ticket_fts, {', '.join(map(str, SEARCH_WEIGHTS))}), t.number_ticket DESC"
+    else:
+        order = 'ticket_fts.rowid DESC'
+    query = f'''
+        SELECT t.number_ticket, t.time_ticket, t.organization, t.state_ticket,
+               snippet(ticket_fts, -1, ?, ?, '…', 12)
+        FROM ticket_fts JOIN ticket t ON t.number_ticket = ticket_fts.rowid
+        WHERE ticket_fts MATCH ?
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    '''
+    return execute_query(query, (SEARCH_MARK_START, SEARCH_MARK_END, match, limit, offset)), total
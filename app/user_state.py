@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from app import async_sql as db
+
+# Позиции пользователей (ячейка users.pos) хранятся в памяти: чтение не идет
+# в базу, а изменения копятся и записываются пачкой раз в FLUSH_INTERVAL секунд.
+MAX_SIZE = 10000
+FLUSH_INTERVAL = 1.0
+
+_positions = OrderedDict()   # tg_id -> pos, LRU
+_dirty = {}                  # tg_id -> pos, еще не записанные в базу
+_lock = threading.Lock()
+_flusher = None
+# Увеличивается при каждом set_pos: get_pos не кэширует прочитанное из базы,
+# если позиции менялись, пока шел запрос
+_version = 0
+
+logger = logging.getLogger(__name__)
+
+
+def _remember(tg_id, pos):
+    _positions[tg_id] = pos
+    _positions.move_to_end(tg_id)
+    while len(_positions) > MAX_SIZE:
+        _positions.popitem(last=False)
+
+
+async def get_pos(tg_id):
+    """
+    Возвращает позицию пользователя, обращаясь к базе только при промахе кэша.
+
+    Parameters:
+        tg_id (int): Telegram ID пользователя.
+
+    Returns:
+        str: Позиция пользователя или None, если пользователя нет.
+    """
+    with _lock:
+        if tg_id in _dirty:
+            return _dirty[tg_id]
+        if tg_id in _positions:
+            _positions.move_to_end(tg_id)
+            return _positions[tg_id]
+        version = _version
+    pos = await db.read_pos(tg_id)
+    with _lock:
+        # Пока шел запрос, позицию могли изменить (и даже уже записать в базу):
+        # тогда прочитанное значение может быть устаревшим
+        if tg_id in _dirty:
+            return _dirty[tg_id]
+        if tg_id in _positions:
+            return _positions[tg_id]
+        if pos is not None and _version == version:
+            _remember(tg_id, pos)
+    return pos
+
+
+def set_pos(tg_id, pos):
+    """
+    Изменяет позицию пользователя в памяти. Запись в базу выполнит flush().
+
+    Parameters:
+        tg_id (int): Telegram ID пользователя.
+        pos (str): Новая позиция.
+    """
+    global _version
+    with _lock:
+        _version += 1
+        _remember(tg_id, pos)
+        _dirty[tg_id] = pos
+
+
+async def flush():
+    """
+    Записывает накопленные изменения позиций в базу одной транзакцией.
+    Несколько изменений одного пользователя схлопываются в последнее.
+
+    Returns:
+        int: Количество записанных позиций.
+    """
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return 0
+        batch, _dirty = _dirty, {}
+    try:
+        await db.update_positions(batch)
+    except Exception:
+        # Возвращаем несохраненные изменения, не затирая более новые
+        with _lock:
+            for tg_id, pos in batch.items():
+                _dirty.setdefault(tg_id, pos)
+        raise
+    return len(batch)
+
+
+async def _flush_loop(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush()
+        except Exception:
+            logger.exception("Не удалось записать позиции пользователей")
+
+
+def start(interval=FLUSH_INTERVAL):
+    """
+    Запускает фоновую запись изменений позиций.
+    """
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.get_event_loop().create_task(_flush_loop(interval))
+
+
+async def shutdown():
+    """
+    Останавливает фоновую запись и сохраняет все оставшиеся изменения.
+    """
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        try:
+            await _flusher
+        except asyncio.CancelledError:
+            pass
+        _flusher = None
+    await flush()
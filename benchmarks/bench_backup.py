@@ -0,0 +1,124 @@
+"""
+Бенчмарк резервного копирования (app.backup): время копии и влияние
+на время обработки обновлений.
+
+Бот из main.py работает на временной базе с большим количеством заявок
+под нагрузкой из bench_load.py (синтетические обновления, заглушка Bot API).
+Время обработки обновлений сравнивается без копирования, во время
+копирования порциями с паузами (как по расписанию) и во время копирования
+за один шаг без пауз.
+
+Запуск:
+    python benchmarks/bench_backup.py [заявок в базе] [одновременных пользователей]
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher
+
+import bench_load
+from app import backup, sql
+
+WARMUP_SECONDS = 3
+IDLE_SECONDS = 10
+
+
+def seed_bulk(total):
+    # Заявки для объема базы (поверх пользователей и заявок bench_load.seed)
+    rows = ((random.randrange(1, bench_load.USERS + 1), f'ООО {random.randrange(50)}', 'г. Иваново, ул. Пушкина',
+             'Не работает принтер, после перезагрузки ошибка ' * 4, '2024-01-01 10:00:00', "Завершена", 'Готово')
+            for _ in range(total))
+    with sql.transaction() as conn:
+        conn.executemany(
+            'INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, '
+            'ticket_comm) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+async def load(bot_main, concurrency, open_tickets, stop):
+    """
+    Подает сценарии bench_load, пока не установлен stop.
+
+    Returns:
+        list: Время обработки каждого обновления в секундах.
+    """
+    factory = bench_load.Updates()
+    latencies = []
+
+    async def worker(index):
+        users = list(range(index + 1, bench_load.USERS + 1, concurrency))
+        while not stop.is_set():
+            name = random.choices(list(bench_load.SCENARIOS), weights=list(bench_load.SCENARIOS.values()))[0]
+            tg_id = bench_load.ADMIN_ID if name == 'admin' and index == 0 else random.choice(users)
+            for _, update in bench_load.scenario_steps(name, factory, tg_id, open_tickets):
+                start = time.perf_counter()
+                await bot_main.dp.process_update(update)
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies
+
+
+async def phase(bot_main, concurrency, open_tickets, name, job=None):
+    stop = asyncio.Event()
+    task = asyncio.create_task(load(bot_main, concurrency, open_tickets, stop))
+    await asyncio.sleep(WARMUP_SECONDS)
+    start = time.perf_counter()
+    if job is None:
+        await asyncio.sleep(IDLE_SECONDS)
+        results = []
+    else:
+        results = await job()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    values = sorted(await task)
+    p = [bench_load.percentile(values, q) * 1000 for q in (0.5, 0.95, 0.99)]
+    size = sum(result['size'] for result in results) / 2 ** 20
+    steps = sum(result['steps'] for result in results)
+    print(f"{name:<22} {elapsed:>8.2f} {steps:>7} {size:>8.1f} {len(values) / (elapsed + WARMUP_SECONDS):>9.0f} "
+          f"{p[0]:>8.2f} {p[1]:>8.2f} {p[2]:>8.2f} {values[-1] * 1000:>8.1f}")
+
+
+async def run(bot_main, tickets, concurrency, directory):
+    Bot.set_current(bot_main.bot)
+    Dispatcher.set_current(bot_main.dp)
+    open_tickets = bench_load.seed()
+    random.shuffle(open_tickets)
+    print(f"seeding {tickets} tickets...")
+    seed_bulk(tickets)
+    print(f"database: {os.path.getsize(sql.DB_PATH) / 2 ** 20:.0f} MB")
+    await bot_main.on_startup(bot_main.dp)
+    loop = asyncio.get_running_loop()
+
+    print(f"{'phase':<22} {'sec':>8} {'steps':>7} {'gz MB':>8} {'upd/s':>9} "
+          f"{'p50, ms':>8} {'p95, ms':>8} {'p99, ms':>8} {'max, ms':>8}")
+    await phase(bot_main, concurrency, open_tickets, 'без копирования')
+    await phase(bot_main, concurrency, open_tickets, 'порциями с паузами', lambda: backup.run_backup(directory))
+    await phase(bot_main, concurrency, open_tickets, 'за один шаг',
+                lambda: loop.run_in_executor(None, backup.backup_database, directory, backup.KEEP, -1, 0))
+    await bot_main.on_shutdown(bot_main.dp)
+    await (await bot_main.bot.get_session()).close()
+
+
+def main():
+    tickets = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(1)
+
+    bench_load.install_fake_config()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        import main as bot_main
+        logging.getLogger().setLevel(logging.WARNING)
+        bot_main.loop.run_until_complete(run(bot_main, tickets, concurrency, os.path.join(tmp, 'backups')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Микробенчмарк маршрутизации колбеков.
+
+Сравнивает последовательную проверку if-цепочкой (как было в
+inline_kb_answer_callback_handler) с app.router.Router при росте
+количества экранов.
+
+Запуск:
+    python benchmarks/bench_callback_routing.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.router import Router
+
+PREFIXES = ('ticket', 'complete', 'my_ticket_page', 'admin_page')
+SAMPLES = ('main_menu', 'ticket_1542', 'my_ticket_page_3_b120', 'screen_last')
+
+
+def handler(*args):
+    return args
+
+
+def if_chain(actions):
+    # Каждая ветка проверяется при каждом нажатии, как в цепочке if без elif
+    def dispatch(data):
+        found = None
+        for action in actions:
+            if data == action:
+                found = handler
+        for prefix in PREFIXES:
+            if data.startswith(prefix + '_'):
+                found = handler
+        return found
+    return dispatch
+
+
+def router(actions):
+    table = Router()
+    for action in actions:
+        table.add(action, handler)
+    for prefix in PREFIXES:
+        table.add_prefix(prefix, handler)
+    return lambda data: table.resolve(data)[0]
+
+
+def main():
+    number = 20000
+    print(f"{'screens':>8} {'if-chain, ns':>14} {'router, ns':>12}")
+    for screens in (12, 50, 200, 1000):
+        actions = ['main_menu'] + [f'screen_{i}' for i in range(screens - 2)] + ['screen_last']
+        results = []
+        for factory in (if_chain, router):
+            dispatch = factory(actions)
+            elapsed = timeit.timeit(lambda: [dispatch(data) for data in SAMPLES], number=number)
+            results.append(elapsed / (number * len(SAMPLES)) * 1e9)
+        print(f"{screens:>8} {results[0]:>14.0f} {results[1]:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Бенчмарк выгрузки заявок (app.export): память и отзывчивость цикла событий.
+
+Заполняет временную базу заявками и выгружает их в CSV и JSONL (gzip) так же,
+как команда /export. Во время выгрузки цикл событий каждые 10 мс просыпается
+и замеряет задержку пробуждения. Для сравнения - выгрузка через fetchall
+(вся выборка в памяти), она выполняется последней: рост памяти оценивается
+по приросту пикового RSS процесса.
+
+Запуск:
+    python benchmarks/bench_export.py [количество заявок]
+"""
+import asyncio
+import csv
+import gzip
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import export, sql
+
+USERS = 20000
+TICK = 0.01
+
+
+def seed(total):
+    conn = sql.get_connection()
+    # Индекс поиска и свертки для выгрузки не нужны
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'ticket'").fetchall():
+        conn.execute(f'DROP TRIGGER {name}')
+    now = int(time.time())
+    rows = ((random.randrange(1, USERS + 1), f'ООО Ромашка {random.randrange(2000)}', 'г. Иваново, ул. Пушкина',
+             'Не работает принтер, после перезагрузки ошибка ' * 3, '2024-01-01 10:00:00',
+             "Завершена" if i % 10 else "В работе", 'Заменили картридж', now - i * 30, now - i * 20)
+            for i in range(total))
+    with sql.transaction():
+        conn.executemany(
+            'INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, '
+            'ticket_comm, created_at, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+def fetchall_export(path):
+    # Наивная выгрузка: вся выборка загружается в память
+    rows = sql.execute_query(f'SELECT {", ".join(expression for _, expression in sql.EXPORT_COLUMNS)} FROM ticket')
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows(rows)
+    return len(rows)
+
+
+async def measure(name, export_call):
+    lags = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    task = asyncio.create_task(ticker())
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    path, count = await export_call()
+    elapsed = time.perf_counter() - start
+    # ru_maxrss в Linux - в килобайтах
+    growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) * 1024
+    task.cancel()
+    size = os.path.getsize(path)
+    os.remove(path)
+    lags.sort()
+    print(f"{name:<10} {count:>9} {elapsed:>7.2f} {count / elapsed:>9.0f} {size / 2 ** 20:>8.1f} "
+          f"{growth / 2 ** 20:>9.1f} {lags[len(lags) // 2] * 1000:>9.1f} {lags[-1] * 1000:>9.1f}")
+
+
+async def run(tmp):
+    print(f"{'format':<10} {'rows':>9} {'sec':>7} {'rows/s':>9} {'file MB':>8} {'+RSS MB':>9} "
+          f"{'lag p50':>9} {'lag max':>9}")
+    for export_format in export.FORMATS:
+        await measure(export_format, lambda: export.export_tickets(export_format))
+    await measure('csv done', lambda: export.export_tickets('csv', state="Завершена"))
+
+    async def naive():
+        path = os.path.join(tmp, 'naive.csv.gz')
+        # В потоке бота (как обычные запросы app.sql через async_sql)
+        count = await asyncio.get_running_loop().run_in_executor(None, fetchall_export, path)
+        return path, count
+    await measure('fetchall', naive)
+    await export.shutdown()
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        sql.create_tables()
+        print(f"seeding {total} tickets...")
+        seed(total)
+        asyncio.run(run(tmp))
+        sql.close_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+Нагрузочный тест бота без Telegram.
+
+Синтетические обновления (Message и CallbackQuery) подаются напрямую в
+dp.process_update из main.py. Запросы к Bot API перехватываются в процессе
+и сразу возвращают ответ (с необязательной искусственной задержкой),
+база данных - временная копия с заранее созданными пользователями и заявками.
+
+Смешиваются сценарии: /start, навигация по меню, создание заявки,
+история заявок с пагинацией и работа администратора (очередь, детали,
+комментарий, завершение). Выводятся пропускная способность и p50/p95/p99
+времени обработки обновления по каждому шагу.
+
+Запуск:
+    python benchmarks/bench_load.py [сценариев] [одновременных пользователей] [задержка Bot API, мс]
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import types as module_types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot import api
+
+from app import metrics, notify, sql
+
+USERS = 1000
+TICKETS = 5000
+ADMIN_ID = 1
+BOT_ID = 100000
+# Доли сценариев в смеси
+SCENARIOS = {
+    'start': 20,
+    'navigation': 35,
+    'new_ticket': 15,
+    'history': 20,
+    'admin': 10,
+}
+
+api_calls = {}
+api_latency = 0.0
+
+
+async def fake_make_request(session, server, token, method, data=None, files=None, **kwargs):
+    # Заглушка Bot API: считает вызовы и возвращает правдоподобный ответ
+    api_calls[method] = api_calls.get(method, 0) + 1
+    if api_latency:
+        await asyncio.sleep(api_latency)
+    if method == 'answerCallbackQuery':
+        return True
+    return {
+        'message_id': 1,
+        'date': int(time.time()),
+        'chat': {'id': int(data.get('chat_id') or 1), 'type': 'private'},
+        'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'bot'},
+        'text': data.get('text', ''),
+    }
+
+
+class Updates:
+    """
+    Фабрика синтетических обновлений с последовательными update_id.
+    """
+
+    def __init__(self):
+        self.update_id = 0
+
+    def _next_id(self):
+        self.update_id += 1
+        return self.update_id
+
+    def _user(self, tg_id):
+        return {'id': tg_id, 'is_bot': False, 'first_name': f'user{tg_id}', 'username': f'user{tg_id}'}
+
+    def message(self, tg_id, text):
+        message = {
+            'message_id': self.update_id,
+            'date': int(time.time()),
+            'chat': {'id': tg_id, 'type': 'private'},
+            'from': self._user(tg_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return types.Update(update_id=self._next_id(), message=message)
+
+    def callback(self, tg_id, data):
+        return types.Update(update_id=self._next_id(), callback_query={
+            'id': str(self.update_id),
+            'from': self._user(tg_id),
+            'chat_instance': str(tg_id),
+            'data': data,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': tg_id, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'bot'},
+                'text': '...',
+            },
+        })
+
+
+def scenario_steps(name, factory, tg_id, open_tickets):
+    """
+    Возвращает список шагов сценария: (имя шага, обновление).
+    """
+    if name == 'start':
+        return [('/start', factory.message(tg_id, '/start'))]
+    if name == 'navigation':
+        return [(action, factory.callback(tg_id, action)) for action in ('main_menu', 'my_company', 'my_ticket', 'main_menu')]
+    if name == 'new_ticket':
+        return [
+            ('new_ticket', factory.callback(tg_id, 'new_ticket')),
+            ('new_ticket text', factory.message(tg_id, 'Не работает принтер на 4 ПК')),
+        ]
+    if name == 'history':
+        return [
+            ('my_ticket_history', factory.callback(tg_id, 'my_ticket_history')),
+            ('my_ticket_page', factory.callback(tg_id, f'my_ticket_page_2_b{TICKETS * 2}')),
+        ]
+    steps = [
+        ('admin_panel', factory.callback(tg_id, 'admin_panel')),
+        ('admin_page', factory.callback(tg_id, 'admin_page_n_0_0')),
+    ]
+    if open_tickets:
+        ticket_id = open_tickets.pop()
+        steps += [
+            ('ticket', factory.callback(tg_id, f'ticket_{ticket_id}')),
+            ('ticket comment', factory.message(tg_id, 'Готово')),
+            ('complete', factory.callback(tg_id, f'complete_{ticket_id}')),
+        ]
+    return steps
+
+
+def seed():
+    """
+    Заполняет временную базу пользователями и заявками (каждая третья завершена).
+
+    Returns:
+        list: Номера открытых заявок.
+    """
+    conn = sql.get_connection()
+    with sql.transaction():
+        conn.executemany(
+            'INSERT INTO users (tg_id, pos, data_reg, profile, organization, organization_phone) VALUES (?, ?, ?, ?, ?, ?)',
+            [(tg_id, 'main_menu', '2024-01-01', '{}', f'ООО {tg_id % 50}', '+79100000000') for tg_id in range(1, USERS + 1)],
+        )
+        conn.executemany(
+            'INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(i % USERS + 1, f'ООО {i % 50}', 'адрес', 'текст заявки', '2024-01-01 10:00:00',
+              'Завершена' if i % 3 == 0 else 'В работе', '') for i in range(TICKETS)],
+        )
+    rows = sql.execute_query('SELECT number_ticket FROM ticket WHERE state_ticket = ?', ('В работе',))
+    return [row[0] for row in rows]
+
+
+def install_fake_config(fake_api=True, **overrides):
+    """
+    Подставляет настройки бота для теста вместо config.py (до import main),
+    снимает ограничения частоты уведомлений и перехватывает запросы к Bot API.
+
+    Parameters:
+        fake_api (bool): Заменить запросы к Bot API на fake_make_request (по умолчанию True).
+        **overrides: Дополнительные настройки config (BOT_MODE, TELEGRAM_API_SERVER и т.д.).
+
+    Returns:
+        module: Модуль config.
+    """
+    config = module_types.ModuleType('config')
+    config.BOT_TOKEN = '123456:' + 'A' * 35
+    config.ADMIN_USERS = [ADMIN_ID]
+    config.ADMIN_MESSAGE = ADMIN_ID
+    config.METRICS_LOG_INTERVAL = 0
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    sys.modules['config'] = config
+    # Ограничения частоты Telegram здесь не проверяются
+    notify.GLOBAL_RATE = notify.CHAT_RATE = notify.CHAT_BURST = 10 ** 6
+    if fake_api:
+        api.make_request = fake_make_request
+    return config
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(bot_main, total, concurrency):
+    factory = Updates()
+    open_tickets = seed()
+    random.shuffle(open_tickets)
+    names = random.choices(list(SCENARIOS), weights=list(SCENARIOS.values()), k=total)
+    latencies = {}
+    queue = asyncio.Queue()
+    for name in names:
+        queue.put_nowait(name)
+
+    async def worker(index):
+        # Каждый воркер работает со своими пользователями, чтобы позиции не пересекались
+        users = list(range(index + 1, USERS + 1, concurrency))
+        while not queue.empty():
+            name = queue.get_nowait()
+            tg_id = ADMIN_ID if name == 'admin' and index == 0 else random.choice(users)
+            for step, update in scenario_steps(name, factory, tg_id, open_tickets):
+                start = time.perf_counter()
+                await bot_main.dp.process_update(update)
+                latencies.setdefault(step, []).append(time.perf_counter() - start)
+
+    Bot.set_current(bot_main.bot)
+    Dispatcher.set_current(bot_main.dp)
+    await bot_main.on_startup(bot_main.dp)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await bot_main.notifier.queue.join()
+
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    print(f"Обновлений: {len(all_latencies)}, сценариев: {total}, одновременно: {concurrency}, "
+          f"задержка Bot API: {api_latency * 1000:g} мс")
+    print(f"Пропускная способность: {len(all_latencies) / elapsed:.0f} updates/sec за {elapsed:.2f} с")
+    print(f"{'шаг':<20} {'кол-во':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for step, values in sorted(latencies.items()) + [('ВСЕГО', all_latencies)]:
+        values = sorted(values)
+        print(f"{step:<20} {len(values):>7} {percentile(values, 0.5) * 1000:>9.2f} "
+              f"{percentile(values, 0.95) * 1000:>9.2f} {percentile(values, 0.99) * 1000:>9.2f}")
+    print("Вызовы Bot API:", dict(sorted(api_calls.items())))
+    print("Уведомления:", bot_main.notifier.stats())
+    for line in metrics.snapshot(limit=5).get(metrics.SQL_SECONDS.name, []):
+        print("  sql", line)
+    await bot_main.on_shutdown(bot_main.dp)
+    await (await bot_main.bot.get_session()).close()
+
+
+def main():
+    global api_latency
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    api_latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 0) / 1000
+    random.seed(1)
+
+    install_fake_config()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        import main as bot_main
+        logging.getLogger().setLevel(logging.WARNING)
+        bot_main.loop.run_until_complete(run(bot_main, total, concurrency))
+
+
+if __name__ == '__main__':
+    main()
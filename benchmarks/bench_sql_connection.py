@@ -0,0 +1,66 @@
+"""
+Бенчмарк слоя соединений app/sql.py.
+
+Сравнивает старый путь (новое соединение, commit и close на каждый запрос)
+с долгоживущим соединением в режиме WAL.
+
+Запуск:
+    python benchmarks/bench_sql_connection.py [количество операций]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import sql
+
+
+def connect_per_query(query, params=()):
+    # Поведение execute_query до пула соединений
+    with sqlite3.connect(sql.DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        conn.commit()
+        return cursor.fetchall()
+
+
+def workload(execute, ops):
+    # Смесь, похожая на /start: чтение профиля, два COUNT и запись позиции
+    for i in range(ops // 4):
+        tg_id = i % 100 + 1
+        execute('SELECT profile FROM users WHERE tg_id=?', (tg_id,))
+        execute('SELECT COUNT(*) FROM ticket WHERE tg_id_ticket=? AND state_ticket=?', (tg_id, "В работе"))
+        execute('SELECT COUNT(*) FROM ticket WHERE tg_id_ticket=? AND state_ticket=?', (tg_id, "Завершена"))
+        execute('UPDATE users SET pos = ? WHERE tg_id = ?', ('main_menu', tg_id))
+
+
+def run(name, execute, ops):
+    start = time.perf_counter()
+    workload(execute, ops)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {ops / elapsed:>12.0f} ops/sec")
+    return ops / elapsed
+
+
+def main():
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        sql.create_tables()
+        for tg_id in range(1, 101):
+            sql.add_user(tg_id, 'main_menu', '2024-01-01', {"organization": "Нет данных"})
+            for _ in range(10):
+                sql.add_ticket(tg_id, 'ООО', 'адрес', 'текст', '2024-01-01 10:00:00', "В работе", "")
+        sql.close_connections()
+
+        baseline = run('connect-per-query', connect_per_query, ops)
+        pooled = run('pooled connection', sql.execute_query, ops)
+        print(f"speedup: x{pooled / baseline:.1f}")
+        sql.close_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк создания заявок при одновременной отправке.
+
+Сравнивает прежний путь (add_ticket, get_last_ticket_number и три
+update_profile_data) с атомарным create_ticket через app.async_sql
+и считает, сколько пользователей получили чужой номер заявки.
+
+Запуск:
+    python benchmarks/bench_ticket_creation.py [количество заявок] [одновременных отправок]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import sql
+from app import async_sql as db
+
+USERS = 200
+
+
+async def old_path(tg_id):
+    await db.add_ticket(tg_id, 'ООО', 'адрес', 'текст', '2024-01-01 10:00:00', "В работе", "")
+    number = await db.get_last_ticket_number()
+    await db.update_profile_data(tg_id, 'history_ticket', str(number))
+    await db.update_profile_data(tg_id, 'data_ticket', '2024-01-01 10:00:00')
+    await db.update_profile_data(tg_id, 'user_name', 'user')
+    return number
+
+
+async def new_path(tg_id):
+    return await db.create_ticket(tg_id, 'ООО', 'адрес', 'текст', '2024-01-01 10:00:00', 'user')
+
+
+async def run(name, submit, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    numbers = {}
+
+    async def worker(i):
+        async with semaphore:
+            tg_id = i % USERS + 1
+            numbers[i] = (tg_id, await submit(tg_id))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    # Номер заявки, показанный пользователю, должен принадлежать ему
+    wrong = 0
+    for tg_id, number in numbers.values():
+        if sql.get_ticket_info(number)[1] != tg_id:
+            wrong += 1
+    print(f"{name:<12} {total / elapsed:>10.0f} tickets/sec, чужих номеров: {wrong}")
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        await db.create_tables()
+        for tg_id in range(1, USERS + 1):
+            await db.add_user(tg_id, 'new_ticket', '2024-01-01', {"organization": "ООО"})
+        await run('old path', old_path, total, concurrency)
+        await run('create_ticket', new_path, total, concurrency)
+        await db.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Бенчмарк индексов таблицы ticket.
+
+Заполняет временную базу заявками, измеряет задержку запросов счетчиков
+и выборок без индексов, затем применяет миграции и измеряет повторно.
+
+Запуск:
+    python benchmarks/bench_ticket_indexes.py [количество заявок]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import sql
+
+USERS = 5000
+REPEAT = 50
+
+
+def seed(total):
+    conn = sql.get_connection()
+    rows = (
+        (random.randrange(1, USERS + 1), 'ООО', 'адрес', 'текст заявки', '2024-01-01 10:00:00',
+         "Завершена" if random.random() < 0.95 else "В работе", 'комментарий')
+        for _ in range(total)
+    )
+    conn.executemany(
+        'INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+
+
+def measure():
+    # Запросы, которые обслуживают индексы (счетчики сейчас читаются из ticket_counters)
+    by_user = 'SELECT {} FROM ticket WHERE tg_id_ticket=? AND state_ticket=?'
+    queries = {
+        'count by user and state': (by_user.format('COUNT(*)'), lambda: (random.randrange(1, USERS + 1), "В работе")),
+        'get_tickets_in_progress_by_user_id': (by_user.format('*'), lambda: (random.randrange(1, USERS + 1), "В работе")),
+        'get_completed_tickets_by_user': (by_user.format('*'), lambda: (random.randrange(1, USERS + 1), "Завершена")),
+        'count by state': ('SELECT COUNT(*) FROM ticket WHERE state_ticket=?', lambda: ("В работе",)),
+    }
+    results = {}
+    for name, (query, params) in queries.items():
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            sql.execute_query(query, params())
+        results[name] = (time.perf_counter() - start) / REPEAT * 1000
+    return results
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        # Создаем базу в состоянии до миграций
+        migrations = sql.MIGRATIONS
+        sql.MIGRATIONS = []
+        sql.create_tables()
+        print(f"seeding {total} tickets...")
+        seed(total)
+        sql.MIGRATIONS = migrations
+
+        before = measure()
+        start = time.perf_counter()
+        sql.migrate()
+        print(f"migration to v{sql.get_schema_version()}: {time.perf_counter() - start:.1f} s")
+        after = measure()
+
+        print(f"{'query':<36} {'before, ms':>12} {'after, ms':>12}")
+        for name in before:
+            print(f"{name:<36} {before[name]:>12.3f} {after[name]:>12.3f}")
+        sql.close_connections()
+
+
+if __name__ == '__main__':
+    main()
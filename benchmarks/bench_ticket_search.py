@@ -0,0 +1,86 @@
+"""
+Бенчмарк поиска заявок: FTS5 (sql.search_tickets) против LIKE.
+
+Заполняет временную базу заявками со случайным текстом (индекс FTS5
+поддерживается триггерами), затем для набора запросов сравнивает
+search_tickets с эквивалентным LIKE-поиском по тем же столбцам (первая
+страница, LIKE без ранжирования - от новых к старым).
+
+Запуск:
+    python benchmarks/bench_ticket_search.py [количество заявок]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import sql
+
+USERS = 5000
+REPEAT = 20
+WORDS = ('принтер', 'сканер', 'монитор', 'сервер', 'почта', 'интернет', 'телефон', 'касса', 'роутер',
+         'пароль', 'картридж', 'бухгалтерия', 'обновление', 'вирус', 'сеть', 'доступ', 'клавиатура', 'диск')
+FILLER = ('не', 'работает', 'нужно', 'проверить', 'подключение', 'срочно', 'после', 'перезагрузки', 'на', 'в', 'офисе')
+QUERIES = ('принтер', 'картридж касса', 'бухгалт', 'ООО Ромашка 17', 'сервер пароль доступ', 'несуществующее')
+
+
+def text(words):
+    return ' '.join(random.choice(WORDS if random.random() < 0.3 else FILLER) for _ in range(words))
+
+
+def seed(total):
+    conn = sql.get_connection()
+    rows = (
+        (random.randrange(1, USERS + 1), f'ООО Ромашка {random.randrange(500)}', f'г. Иваново, ул. Пушкина, д. {random.randrange(100)}',
+         text(12), '2024-01-01 10:00:00', "Завершена" if random.random() < 0.95 else "В работе", text(6))
+        for _ in range(total)
+    )
+    conn.executemany(
+        'INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+
+
+def like_search(search_text, limit=10):
+    # Каждое слово должно встретиться хотя бы в одном из столбцов
+    words = search_text.split()
+    condition = ' AND '.join('(' + ' OR '.join(f'{column} LIKE ?' for column in sql.SEARCH_COLUMNS) + ')' for _ in words)
+    params = [f'%{word}%' for word in words for _ in sql.SEARCH_COLUMNS]
+    query = f'SELECT number_ticket, time_ticket, organization, state_ticket FROM ticket WHERE {condition} ' \
+            f'ORDER BY number_ticket DESC LIMIT ?'
+    return sql.execute_query(query, params + [limit + 1])
+
+
+def measure(func, search_text):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(search_text)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        sql.create_tables()
+        print(f"seeding {total} tickets...")
+        start = time.perf_counter()
+        seed(total)
+        print(f"seeding with FTS triggers: {time.perf_counter() - start:.1f} s")
+
+        print(f"{'query':<24} {'LIKE, ms':>10} {'FTS5, ms':>10} {'LIKE rows':>10} {'FTS rows':>10}")
+        for search_text in QUERIES:
+            like = measure(like_search, search_text)
+            fts = measure(sql.search_tickets, search_text)
+            like_rows = len(like_search(search_text, limit=total))
+            fts_rows = sql.search_tickets(search_text)[1]
+            print(f"{search_text:<24} {like:>10.2f} {fts:>10.2f} {like_rows:>10} {fts_rows:>10}")
+        sql.close_connections()
+
+
+if __name__ == '__main__':
+    main()
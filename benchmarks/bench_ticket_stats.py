@@ -0,0 +1,117 @@
+"""
+Бенчмарк экрана статистики: отчет по сверткам (analytics.get_report)
+против такого же отчета, посчитанного по таблице ticket.
+
+Заполняет временную базу заявками за два года (без триггеров, для
+скорости), затем пересчитывает свертки (rebuild_ticket_rollups - это же
+время занимает миграция на существующей базе) и счетчики. Для периодов
+экрана статистики сравнивается время построения отчета.
+
+Запуск:
+    python benchmarks/bench_ticket_stats.py [количество заявок]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import analytics, render, sql
+
+USERS = 20000
+ORGANIZATIONS = 2000
+MODERATORS = (0, 101, 102, 103, 104, 105)
+SPAN_DAYS = 730
+REPEAT = 5
+
+
+def seed(total):
+    conn = sql.get_connection()
+    # Индексы FTS и свертки здесь не нужны или пересчитываются целиком после заполнения
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'ticket'").fetchall():
+        conn.execute(f'DROP TRIGGER {name}')
+    now = int(time.time())
+    first = now - SPAN_DAYS * 86400
+
+    def rows():
+        for i in range(total):
+            created_at = first + SPAN_DAYS * 86400 * i // total
+            completed_at = created_at + int(random.lognormvariate(9, 1.3))
+            if completed_at > now or random.random() < 0.02:
+                state, completed_at, completed_by = "В работе", None, None
+            else:
+                state, completed_by = "Завершена", random.choice(MODERATORS) or None
+            time_ticket = datetime.datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M:%S')
+            yield (random.randrange(1, USERS + 1), f'ООО Ромашка {int(random.paretovariate(1.2)) % ORGANIZATIONS}',
+                   'адрес', 'текст заявки', time_ticket, state, '', created_at, completed_at, completed_by)
+
+    with sql.transaction():
+        conn.executemany(
+            'INSERT INTO ticket (tg_id_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, '
+            'ticket_comm, created_at, completed_at, completed_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows())
+
+
+def direct_report(days):
+    # Тот же отчет по таблице ticket (индексы по created_at и completed_at)
+    today = datetime.date.today()
+    start = datetime.datetime.combine(today - datetime.timedelta(days=days - 1), datetime.time()).timestamp()
+    period = (int(start), int(time.time()) + 86400)
+    created = sql.execute_query(
+        "SELECT date(created_at, 'unixepoch', 'localtime'), COUNT(*) FROM ticket "
+        "WHERE created_at BETWEEN ? AND ? GROUP BY 1", period)
+    completed = sql.execute_query(
+        "SELECT date(completed_at, 'unixepoch', 'localtime'), COUNT(*) FROM ticket "
+        "WHERE completed_at BETWEEN ? AND ? GROUP BY 1", period)
+    durations = sql.execute_query(
+        'SELECT completed_by, completed_at - created_at FROM ticket WHERE completed_at BETWEEN ? AND ? '
+        'ORDER BY 1, 2', period)
+    organizations = sql.execute_query(
+        'SELECT organization, SUM(created_at >= ?), SUM(completed_at >= ?), AVG(completed_at - created_at) FROM ticket '
+        'WHERE created_at BETWEEN ? AND ? OR completed_at BETWEEN ? AND ? '
+        'GROUP BY organization ORDER BY 2 DESC LIMIT 5', (period[0], period[0]) + period + period)
+    hours = sql.execute_query(
+        "SELECT strftime('%H', created_at, 'unixepoch', 'localtime'), COUNT(*) FROM ticket "
+        "WHERE created_at BETWEEN ? AND ? GROUP BY 1 ORDER BY 2 DESC LIMIT 3", period)
+    return created, completed, durations, organizations, hours
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        sql.create_tables()
+        print(f"seeding {total} tickets over {SPAN_DAYS} days...")
+        start = time.perf_counter()
+        seed(total)
+        print(f"seeding: {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        sql.rebuild_ticket_rollups()
+        sql.rebuild_ticket_counters()
+        print(f"rebuild rollups and counters: {time.perf_counter() - start:.1f} s")
+        sizes = {table: sql.execute_query(f'SELECT COUNT(*) FROM {table}')[0][0]
+                 for table in ('ticket_stats_hourly', 'ticket_stats_daily', 'ticket_stats_resolution')}
+        print("rollup rows:", sizes)
+
+        print(f"{'days':>5} {'rollups, ms':>12} {'render, ms':>11} {'ticket, ms':>11}")
+        for days in render.STATS_PERIODS:
+            rollups = measure(analytics.get_report, days)
+            rendering = measure(lambda: render.stats_report(analytics.get_report(days), days))
+            direct = measure(direct_report, days)
+            print(f"{days:>5} {rollups:>12.2f} {rendering:>11.2f} {direct:>11.2f}")
+        sql.close_connections()
+
+
+if __name__ == '__main__':
+    main()
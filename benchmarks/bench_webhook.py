@@ -0,0 +1,165 @@
+"""
+Проверка и нагрузочный тест бота в режиме webhook без Telegram.
+
+Веб-приложение из main.create_web_app() с обработчиком webhook aiogram
+(как в executor.set_webhook) запускается на localhost. Сценарии bench_load.py
+отправляются в него HTTP-запросами POST, а бот ходит в заглушку Bot API -
+отдельный HTTP-сервер на localhost (настройка TELEGRAM_API_SERVER).
+Часть обновлений отправляется повторно, как при повторе webhook после таймаута.
+
+После нагрузки проверяются /health (нет обновлений в обработке, повторы
+отброшены) и /metrics (обработанные обновления, запросы к Bot API и
+отправленные уведомления). Выводятся пропускная способность и p50/p95/p99
+времени ответа на POST; при несовпадении проверок скрипт завершается с ошибкой.
+
+Запуск:
+    python benchmarks/bench_webhook.py [сценариев] [одновременных пользователей] [повторов]
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+from aiohttp import web
+from aiogram.dispatcher.webhook import configure_app
+
+import bench_load
+from app import sql
+
+
+async def fake_api(request):
+    # Заглушка Bot API: ответ bench_load.fake_make_request в формате Telegram
+    data = dict(await request.post())
+    result = await bench_load.fake_make_request(None, None, None, request.match_info['method'], data)
+    return web.json_response({'ok': True, 'result': result})
+
+
+async def start_site(app):
+    """
+    Запускает приложение на свободном порту localhost.
+
+    Returns:
+        tuple: AppRunner и базовый URL.
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    host, port = runner.addresses[0][:2]
+    return runner, f'http://{host}:{port}'
+
+
+def metric_total(text, name):
+    # Сумма значений метрики по всем наборам меток
+    return sum(float(value) for value in re.findall(rf'^{name}(?:{{[^}}]*}})? (\S+)$', text, re.MULTILINE))
+
+
+async def run(bot_main, total, concurrency, replays):
+    factory = bench_load.Updates()
+    open_tickets = bench_load.seed()
+    random.shuffle(open_tickets)
+    names = random.choices(list(bench_load.SCENARIOS), weights=list(bench_load.SCENARIOS.values()), k=total)
+    queue = asyncio.Queue()
+    for name in names:
+        queue.put_nowait(name)
+    latencies = []
+    statuses = {}
+    sent = []
+
+    # Обработчик webhook подключается так же, как в executor.set_webhook
+    app = bot_main.create_web_app()
+    configure_app(bot_main.dp, app, bot_main.WEBHOOK_PATH)
+    runner, base = await start_site(app)
+    await bot_main.on_startup(bot_main.dp)
+
+    async with aiohttp.ClientSession() as session:
+        async def post(update):
+            start = time.perf_counter()
+            async with session.post(base + bot_main.WEBHOOK_PATH, json=update) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+        async def worker(index):
+            # Каждый воркер работает со своими пользователями, чтобы позиции не пересекались
+            users = list(range(index + 1, bench_load.USERS + 1, concurrency))
+            while not queue.empty():
+                name = queue.get_nowait()
+                tg_id = bench_load.ADMIN_ID if name == 'admin' and index == 0 else random.choice(users)
+                for _, update in bench_load.scenario_steps(name, factory, tg_id, open_tickets):
+                    sent.append(update.to_python())
+                    await post(sent[-1])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        # Повторная доставка уже обработанных обновлений
+        for update in random.sample(sent, min(replays, len(sent))):
+            await post(update)
+        await bot_main.notifier.queue.join()
+
+        async with session.get(base + '/health') as response:
+            health = await response.json()
+        async with session.get(base + '/metrics') as response:
+            metrics_text = await response.text()
+
+    latencies.sort()
+    print(f"Обновлений: {len(sent)}, повторов: {replays}, сценариев: {total}, одновременно: {concurrency}")
+    print(f"Пропускная способность: {len(sent) / elapsed:.0f} updates/sec за {elapsed:.2f} с")
+    print(f"Ответ webhook, мс: p50 {bench_load.percentile(latencies, 0.5) * 1000:.2f}, "
+          f"p95 {bench_load.percentile(latencies, 0.95) * 1000:.2f}, "
+          f"p99 {bench_load.percentile(latencies, 0.99) * 1000:.2f}, max {latencies[-1] * 1000:.2f}")
+    print("HTTP статусы:", statuses)
+    print("Вызовы Bot API:", dict(sorted(bench_load.api_calls.items())))
+    print("/health:", health)
+
+    checks = {
+        'все POST с ответом 200': statuses == {200: len(latencies)},
+        '/health: status ok': health.get('status') == 'ok',
+        '/health: нет обновлений в обработке': health.get('updates_in_flight') == 0,
+        '/health: повторы отброшены': health.get('duplicate_updates') == replays,
+        '/health: очередь уведомлений пуста': health.get('notify_queue_depth') == 0,
+        '/metrics: обработаны все обновления': metric_total(metrics_text, 'helpdesk_update_seconds_count') == len(sent),
+        '/metrics: запросы к Bot API': metric_total(metrics_text, 'helpdesk_telegram_api_seconds_count') > 0,
+        '/metrics: отправленные уведомления': metric_total(metrics_text, 'helpdesk_notify_messages_total') > 0,
+    }
+    for name, ok in checks.items():
+        print(f"  {'OK  ' if ok else 'FAIL'} {name}")
+
+    await bot_main.on_shutdown(bot_main.dp)
+    await (await bot_main.bot.get_session()).close()
+    await runner.cleanup()
+    return all(checks.values())
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    replays = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    random.seed(1)
+    # Цикл событий, который затем использует main.py (asyncio.get_event_loop)
+    loop = asyncio.get_event_loop()
+    api_app = web.Application()
+    api_app.router.add_post('/bot{token}/{method}', fake_api)
+    api_runner, api_url = loop.run_until_complete(start_site(api_app))
+
+    # Бот ходит в заглушку Bot API по HTTP, а не через перехват make_request
+    bench_load.install_fake_config(fake_api=False, BOT_MODE='webhook', TELEGRAM_API_SERVER=api_url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sql.DB_PATH = os.path.join(tmp, 'bench.db')
+        import main as bot_main
+        logging.getLogger().setLevel(logging.WARNING)
+        ok = bot_main.loop.run_until_complete(run(bot_main, total, concurrency, replays))
+        loop.run_until_complete(api_runner.cleanup())
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,3 +3,32 @@ BOT_TOKEN = 'YOU_BOT_TOKEN' #test
 
 ADMIN_USERS = [ID MODER, ID MODER]
 ADMIN_MESSAGE = ID ADMIN
+
+# Режим получения обновлений: 'polling' (long polling) или 'webhook'
+BOT_MODE = 'polling'
+# Публичный адрес бота и путь, на который Telegram отправляет обновления в режиме webhook
+WEBHOOK_HOST = 'https://example.com'
+WEBHOOK_PATH = '/webhook'
+# Адрес и порт встроенного веб-сервера (webhook и /health)
+WEBAPP_HOST = '0.0.0.0'
+WEBAPP_PORT = 8080
+# Максимальное количество одновременно обрабатываемых обновлений
+MAX_CONCURRENT_UPDATES = 100
+# Адрес Bot API сервера (None - api.telegram.org), например локальный или тестовый сервер
+TELEGRAM_API_SERVER = None
+# Окно сводки уведомлений о новых заявках в секундах (0 - отправлять каждую заявку сразу)
+NOTIFY_DIGEST_INTERVAL = 0
+# Доля обновлений, для которых замеряется время обработки (1.0 - все)
+METRICS_SAMPLE_RATE = 1.0
+# Период вывода сводки метрик в лог в секундах (0 - не выводить)
+METRICS_LOG_INTERVAL = 300
+# Логировать каждое входящее обновление (LoggingMiddleware, только для отладки)
+LOG_UPDATES = False
+# Заявки, завершенные больше ARCHIVE_AFTER_DAYS дней назад, переносятся в архив app/archive.db (0 - не архивировать)
+ARCHIVE_AFTER_DAYS = 365
+# Период запуска архивации в секундах
+ARCHIVE_INTERVAL = 3600
+# Каталог резервных копий базы, период копирования в секундах (0 - не копировать) и сколько копий хранить
+BACKUP_DIR = 'backups'
+BACKUP_INTERVAL = 86400
+BACKUP_KEEP = 7
@@ -1,12 +1,28 @@
 import aiogram
-from aiogram import Bot, Dispatcher, types
+from aiogram import Dispatcher, types
 from aiogram.contrib.middlewares.logging import LoggingMiddleware
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram import executor
+from aiogram.bot.api import TelegramAPIServer
+from aiohttp import web
 from app import sql
+from app import async_sql as db
+from app import user_state
+from app import render
+from app.router import Router
+from app.middlewares import ConcurrencyLimitMiddleware, DeduplicateUpdatesMiddleware, MetricsMiddleware
+from app import metrics
+from app import archive
+from app import export
+from app import backup
+from app.notify import Notifier, Digest
 import config
 from config import ADMIN_USERS, ADMIN_MESSAGE
+import html
+import functools
+import inspect
 import datetime
+import os
 
 import asyncio
 loop = asyncio.get_event_loop()
@@ -14,9 +30,46 @@ import logging
 logging.basicConfig(level=logging.INFO)
 
 
-bot = Bot(token=config.BOT_TOKEN)
+# Настройки режима работы (значения по умолчанию для старых config.py)
+BOT_MODE = getattr(config, 'BOT_MODE', 'polling')
+WEBHOOK_HOST = getattr(config, 'WEBHOOK_HOST', None)
+WEBHOOK_PATH = getattr(config, 'WEBHOOK_PATH', '/webhook')
+WEBAPP_HOST = getattr(config, 'WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = getattr(config, 'WEBAPP_PORT', 8080)
+MAX_CONCURRENT_UPDATES = getattr(config, 'MAX_CONCURRENT_UPDATES', 100)
+TELEGRAM_API_SERVER = getattr(config, 'TELEGRAM_API_SERVER', None)
+NOTIFY_DIGEST_INTERVAL = getattr(config, 'NOTIFY_DIGEST_INTERVAL', 0)
+METRICS_SAMPLE_RATE = getattr(config, 'METRICS_SAMPLE_RATE', 1.0)
+METRICS_LOG_INTERVAL = getattr(config, 'METRICS_LOG_INTERVAL', 300)
+LOG_UPDATES = getattr(config, 'LOG_UPDATES', False)
+ARCHIVE_AFTER_DAYS = getattr(config, 'ARCHIVE_AFTER_DAYS', 0)
+ARCHIVE_INTERVAL = getattr(config, 'ARCHIVE_INTERVAL', 3600)
+BACKUP_DIR = getattr(config, 'BACKUP_DIR', 'backups')
+BACKUP_INTERVAL = getattr(config, 'BACKUP_INTERVAL', 0)
+BACKUP_KEEP = getattr(config, 'BACKUP_KEEP', 7)
+
+if TELEGRAM_API_SERVER:
+    bot = metrics.MeteredBot(token=config.BOT_TOKEN, server=TelegramAPIServer.from_base(TELEGRAM_API_SERVER))
+else:
+    bot = metrics.MeteredBot(token=config.BOT_TOKEN)
 dp = Dispatcher(bot)
-dp.middleware.setup(LoggingMiddleware())
+if LOG_UPDATES:
+    # Подробный лог каждого обновления (только для отладки)
+    dp.middleware.setup(LoggingMiddleware())
+dp.middleware.setup(MetricsMiddleware(METRICS_SAMPLE_RATE))
+# Дедупликация подключается до ограничения параллельности (см. DeduplicateUpdatesMiddleware)
+deduplicate_updates = DeduplicateUpdatesMiddleware()
+dp.middleware.setup(deduplicate_updates)
+concurrency_limit = ConcurrencyLimitMiddleware(MAX_CONCURRENT_UPDATES)
+dp.middleware.setup(concurrency_limit)
+# Очередь исходящих уведомлений с ограничением частоты
+notifier = Notifier(bot)
+# Уведомления о новых заявках получают главный админ и все модераторы
+new_ticket_alerts = Digest(
+    notifier, [ADMIN_MESSAGE, *ADMIN_USERS], NOTIFY_DIGEST_INTERVAL,
+    lambda lines: render.NEW_TICKET_DIGEST_TEMPLATE(count=len(lines), interval=NOTIFY_DIGEST_INTERVAL, lines='\n'.join(lines)),
+    parse_mode="HTML", reply_markup=render.NEW_TICKET_ALERT_KEYBOARD,
+)
 # Создание таблиц в базе данных SQLite
 sql.create_tables()
 
@@ -25,7 +78,8 @@ sql.create_tables()
 async def send_start(message: types.Message):
     user_id = message.from_user.id
     data_reg = message.date
-    user = sql.get_user_by_id(user_id)
+    # Профиль и счетчики заявок одним запросом
+    user = await db.get_user_dashboard(user_id)
     
     if not user:
         # Если пользователь отсутствует, добавляем его
@@ -35,85 +89,70 @@ async def send_start(message: types.Message):
             'data_reg': data_reg, 
             'profile': {"organization": "Нет данных", "organization_adress": "Нет данных", "organization_inn": "Нет данных", "organization_phone": "Нет данных", "history_ticket": "", "data_ticket": "", "user_name": ""}
         }
-        sql.add_user(**user_info)
-        text_no_user = f"Добро пожаловать в HelpDesk компании <b>ЭниКей</b>! Для работы в сервисе необходимо заполнить данные."
-        keyboard = InlineKeyboardMarkup()
-        keyboard.add(InlineKeyboardButton(text="🏢 Моя компания", callback_data="my_company"))
-        await message.answer(text_no_user, reply_markup=keyboard, parse_mode="HTML")
+        await db.add_user(**user_info)
+        await message.answer(render.WELCOME_TEXT, reply_markup=render.WELCOME_KEYBOARD, parse_mode="HTML")
         
     else:
-        # Проверка открытых\закрытых тикетов 
-        open_ticket = sql.get_total_tickets_by_status_for_user(user_id, "В работе")
-        closed_ticket = sql.get_total_tickets_by_status_for_user(user_id, "Завершена")
-        # Чтение профиля
-        profile = sql.read_profile(user_id)
-        sql.update_pos('main_menu', 'tg_id', user_id)
-        organization = profile.get("organization", "Нет данных")
-        organization_phone = profile.get("organization_phone", "Нет данных")
-        
-        text_user =  (f"<b>🧑‍💻 Главное меню</b> \n\n" 
-                f"<b>📋 Компания: </b> {organization}\n"
-                f"<b>☎️ Контактный номер:</b> {organization_phone}\n\n"
-                
-                f"<b>📬Открытых заявок:</b> {open_ticket}\n" 
-                f"<b>📭Закрытых заявок:</b> {closed_ticket}\n" 
-                f"\nВыберите интересующее действие ⬇️"
-        )
-        keyboard = InlineKeyboardMarkup()
-        keyboard.add(InlineKeyboardButton(text="🏢 Моя компания", callback_data="my_company"),
-                    InlineKeyboardButton(text="📥 Мои заявки", callback_data="my_ticket"))
-        keyboard.add(InlineKeyboardButton(text="📤 Новая заявка", callback_data="new_ticket"))
-                
-        # Проверяем, является ли пользователь администратором
-        if user_id in ADMIN_USERS:
-            ticket_menu_admin = types.InlineKeyboardButton("🤘 Тикет меню", callback_data="admin_panel")
-            keyboard.add(ticket_menu_admin)
+        user_state.set_pos(user_id, 'main_menu')
+        text_user, keyboard = render.main_menu(user['profile'], user['open_tickets'], user['closed_tickets'], user_id in ADMIN_USERS)
         await message.answer(text_user, reply_markup=keyboard, parse_mode="HTML")
        
     
+@dp.message_handler(commands=['search'])
+async def send_search(message: types.Message):
+    # Поиск заявок командой /search <текст> (только для администраторов)
+    if not is_admin(message.from_user.id):
+        return
+    search_text = message.get_args()
+    if not search_text:
+        user_state.set_pos(message.from_user.id, 'admin_search')
+        await message.answer(render.ADMIN_SEARCH_TEXT, reply_markup=render.BACK_TO_ADMIN_KEYBOARD, parse_mode="HTML")
+        return
+    admin_search_queries[message.from_user.id] = search_text
+    text, keyboard = await admin_search_results(message.from_user.id)
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@dp.message_handler(commands=['export'])
+async def send_export(message: types.Message):
+    # Выгрузка заявок файлом /export [формат] [статус] [даты] [организация] (только для администраторов)
+    if not is_admin(message.from_user.id):
+        return
+    try:
+        params = export.parse_args(message.get_args() or '')
+    except ValueError:
+        await message.answer(render.EXPORT_HELP_TEXT, parse_mode="HTML")
+        return
+    await message.answer(render.EXPORT_PROGRESS_TEXT)
+    export_format = params.pop('format')
+    path, count = await export.export_tickets(export_format, **params)
+    try:
+        if not count:
+            await message.answer("Заявок по заданным фильтрам нет.")
+            return
+        if os.path.getsize(path) > export.MAX_DOCUMENT_SIZE:
+            await message.answer("Файл выгрузки больше 50 МБ, уточните фильтры.\n\n" + render.EXPORT_HELP_TEXT, parse_mode="HTML")
+            return
+        filename = f"tickets_{datetime.date.today().isoformat()}.{export_format}.gz"
+        await message.answer_document(types.InputFile(path, filename=filename), caption=f"Заявок: {count}")
+    finally:
+        os.remove(path)
+
+
 # Главное меню пользователя мимикрия под /start
-def main_menu(tg_id):
-    sql.update_pos('main_menu', 'tg_id', tg_id)
-    user_id = tg_id
-    open_ticket = sql.get_total_tickets_by_status_for_user(tg_id, "В работе")
-    closed_ticket = sql.get_total_tickets_by_status_for_user(tg_id, "Завершена")
-    profile = sql.read_profile(tg_id)
-    organization = profile.get("organization", "Нет данных")
-    organization_phone = profile.get("organization_phone", "Нет данных")
-    
-    text =  (f"<b>🧑‍💻 Главное меню</b> \n\n" 
-            f"<b>📋 Компания: </b> {organization}\n"
-            f"<b>☎️ Контактный номер:</b> {organization_phone}\n\n"
-            
-            f"<b>📬Открытых заявок:</b> {open_ticket}\n" 
-            f"<b>📭Закрытых заявок:</b> {closed_ticket}\n" 
-            f"\nВыберите интересующее действие ⬇️"
-    )
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="🏢 Моя компания", callback_data="my_company"),
-                 InlineKeyboardButton(text="📥 Мои заявки", callback_data="my_ticket"))
-    keyboard.add(InlineKeyboardButton(text="📤 Новая заявка", callback_data="new_ticket"))
-    
-    # Проверяем, является ли пользователь администратором
-    if user_id in ADMIN_USERS:
-        ticket_menu_admin = types.InlineKeyboardButton("🤘Тикет меню", callback_data="admin_panel")
-        keyboard.add(ticket_menu_admin)
-    return text, keyboard
+async def main_menu(tg_id):
+    user_state.set_pos(tg_id, 'main_menu')
+    dashboard = await db.get_user_dashboard(tg_id)
+    return render.main_menu(dashboard['profile'], dashboard['open_tickets'], dashboard['closed_tickets'], tg_id in ADMIN_USERS)
     
     
 def new_ticket(tg_id):
-    text = (f"<b>📤 Создание новой заявки</b>\n\n" 
-            # f" - 📝 Опишите вашу проблему.\n"
-            f" - 🧩 Пожалуйста, опишите вашу проблему и укажите как можно подробнее.\n\n"
-            f"<b>Пример оформления заявки:</b> \n<i>Не работает принтер на 4 ПК, необходимо проверить подключение.</i>")
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu"))
-    return text, keyboard 
+    return render.NEW_TICKET_TEXT, render.BACK_TO_MAIN_KEYBOARD
 
 
-def my_ticket(tg_id):
-    profile = sql.read_profile(tg_id)
-    user_tickets_in_progress = sql.get_tickets_in_progress_by_user_id(tg_id)
+async def my_ticket(tg_id):
+    profile = await db.read_profile(tg_id)
+    user_tickets_in_progress = await db.get_tickets_in_progress_by_user_id(tg_id)
     total_user_tickets_in_progress = len(user_tickets_in_progress)
     open_ticket = str(total_user_tickets_in_progress) if total_user_tickets_in_progress else "0"
     organization = profile.get("organization")
@@ -133,368 +172,476 @@ def my_ticket(tg_id):
                      f"<b>Статус:</b> {ticket[6]}\n"
                      )
     else:
-        text = '<b>📥 Мои заявки </b>\n\nУ вас пока нет заявок в работе..  🤷‍♂️ \n- <i>Что бы оставить заявку воспользуйтесь меню </i><b>"📤 Новая заявка"</b>'
+        text = render.NO_TICKETS_TEXT
 
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="☑️ История заявок", callback_data="my_ticket_history"))
-    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu"))
-    return text, keyboard
+    return text, render.MY_TICKET_KEYBOARD
 
 
-def my_ticket_history(tg_id, page=1, page_size=4):
-    completed_tickets = sql.get_completed_tickets_by_user(tg_id)
+async def my_ticket_history(tg_id, page=1, cursor=None, page_size=4):
+    # Курсор: 'b<номер>' - заявки старше номера, 'a<номер>' - новее номера
+    before = int(cursor[1:]) if cursor and cursor[0] == 'b' else None
+    after = int(cursor[1:]) if cursor and cursor[0] == 'a' else None
+    completed_tickets, total = await db.get_completed_tickets_page(tg_id, before=before, after=after, limit=page_size)
     # Проверяем, есть ли завершенные заявки
     if completed_tickets:
         # Проверяем, нужна ли пагинация
-        if len(completed_tickets) > page_size:
-            start_index = (page - 1) * page_size
-            end_index = start_index + page_size
-            current_page_tickets = completed_tickets[start_index:end_index]
+        if total > page_size:
             text = f"<b>📨 История ваших завершенных заявок (страница {page}):</b>\n\n"
         else:
-            current_page_tickets = completed_tickets
             text = "<b>📨 История ваших завершенных заявок:</b>\n\n"
         
-        for ticket in current_page_tickets:
+        for ticket in completed_tickets:
             text += f"✅\n" \
                     f"<b>├ Номер заявки:</b> <code>#{ticket[0]}</code>\n" \
-                    f"<b>├ Время создания:</b> {ticket[5]}\n" \
-                    f"<b>├ Сообщение:</b> - <em>{ticket[4]}</em>\n" \
-                    f"<b>└ Комментарий исполнителя:</b>  - <em>{ticket[7]}</em>\n\n"
+                    f"<b>├ Время создания:</b> {ticket[1]}\n" \
+                    f"<b>├ Сообщение:</b> - <em>{ticket[2]}</em>\n" \
+                    f"<b>└ Комментарий исполнителя:</b>  - <em>{ticket[3]}</em>\n\n"
                     
     else:
         text = "🤷‍♂️ Упс.. У вас нет истории заявок."
         
     keyboard = InlineKeyboardMarkup()
     # Создаем кнопки для навигации по страницам, если нужно
-    if len(completed_tickets) > page_size:
+    if completed_tickets and total > page_size:
         if page > 1:
-            keyboard.row(InlineKeyboardButton(text="🔙 Предыдущая", callback_data=f"my_ticket_page_{page - 1}"))
-        if end_index < len(completed_tickets):
-            keyboard.insert(InlineKeyboardButton(text="🔜 Следующая", callback_data=f"my_ticket_page_{page + 1}"))
+            keyboard.row(InlineKeyboardButton(text="🔙 Предыдущая", callback_data=f"my_ticket_page_{page - 1}_a{completed_tickets[0][0]}"))
+        if page * page_size < total:
+            keyboard.insert(InlineKeyboardButton(text="🔜 Следующая", callback_data=f"my_ticket_page_{page + 1}_b{completed_tickets[-1][0]}"))
     keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="my_ticket"))
     return text, keyboard
 
 
-def my_company(tg_id):
-    profile = sql.read_profile(tg_id)
-    organization = profile.get("organization", "Нет данных")
-    organization_address = profile.get("organization_adress", "Нет данных")
-    organization_inn = profile.get("organization_inn", "Нет данных")
-    organization_phone = profile.get("organization_phone", "Нет данных")
-    
-    # Формирование текста для отображения данных о компании
-    text = (f"<b>🏢 Информация о компании</b>\n\n" 
-           f"<b>📋 Компания:</b> {organization}\n" 
-           f"<b>📍 Адрес:</b> {organization_address}\n" 
-           f"<b>📑 ИНН:</b> {organization_inn}\n" 
-           f"<b>☎️ Контактный номер:</b> <i>{organization_phone}</i>\n\n" 
-           f"<b>ЗАПОЛНИТЬ ДАННЫЕ О КОМПАНИИ ⬇️ </b>" )  
-    
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text=f"{'✅' if organization != 'Нет данных' else '❌'} Наименование компании", callback_data="edit_company_name"))
-    keyboard.add(InlineKeyboardButton(text=f"{'✅' if organization_address != 'Нет данных' else '❌'} Фактический адрес", callback_data="edit_company_adress"))
-    keyboard.add(InlineKeyboardButton(text=f"{'✅' if organization_inn != 'Нет данных' else '❌'} ИНН", callback_data="edit_company_inn"))
-    keyboard.add(InlineKeyboardButton(text=f"{'✅' if organization_phone != 'Нет данных' else '❌'} Контактный номер", callback_data="edit_company_phone"))
-    keyboard.add(InlineKeyboardButton(text="⬅️ В меню", callback_data="main_menu"))
-    return text, keyboard
+async def my_company(tg_id):
+    profile = await db.read_profile(tg_id)
+    return render.my_company(profile)
 
 
 def edit_company_name(tg_id):
-    text = f"📋 Введите наименование организации. \nПример: <code> ООО РОГА И КОПЫТА </code>"
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="my_company"))
-    return text, keyboard
+    return render.EDIT_COMPANY_NAME_TEXT, render.BACK_TO_COMPANY_KEYBOARD
 
 def edit_company_adress(tg_id):
-    text = f"📍Введите фактический адрес организации. \nПример: <code> г. Иваново, ул. Пушкина, д. 3 оф. 1 </code>"
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="my_company"))
-    return text, keyboard
+    return render.EDIT_COMPANY_ADRESS_TEXT, render.BACK_TO_COMPANY_KEYBOARD
     
 def edit_company_inn(tg_id):
-    text = f"📑 Введите ИНН организации. \nПример: <code> 3700010101 </code>"
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="my_company"))
-    return text, keyboard
+    return render.EDIT_COMPANY_INN_TEXT, render.BACK_TO_COMPANY_KEYBOARD
 
 def edit_company_phone(tg_id):
-    text = f"☎️ Введите контактный номер телефона. \nПример: <code> +79100009999 </code>"
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="my_company"))
-    return text, keyboard
+    return render.EDIT_COMPANY_PHONE_TEXT, render.BACK_TO_COMPANY_KEYBOARD
       
-def done_ticket(tg_id):
-    last_ticket_number = sql.get_last_ticket_number()   
-    text = f'🎉🥳 Успех, ваша заявка зарегистрирована! \n\n<b>Номер заявки: </b><code>#{last_ticket_number}</code>. \n\n<i>PS: Отслеживайте статус поставленных задач в разделе</i> <b>"📥 Мои заявки"</b>'
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton(text="🧑‍💻 Главное меню", parse_mode="HTML", callback_data="main_menu"))
-    return text, keyboard
+def done_ticket(ticket_number):
+    return render.DONE_TICKET_TEMPLATE(ticket_number), render.DONE_TICKET_KEYBOARD
 
 
 # Административный раздел
-def admin_panel():
-    total_open_tickets = sql.get_total_tickets_by_status_admin("В работе")  # Получаем общее количество заявок "В работе"
-    total_closed_tickets = sql.get_total_tickets_by_status_admin("Завершена")  # Получаем общее количество завершенных заявок
-    all_tickets_in_progress = sql.get_all_tickets_in_progress()
+ADMIN_PAGE_SIZE = 10  # Заявок на одной странице очереди
+
+
+# Колбек страницы очереди: admin_page_<порядок o|n>_<номер заявки-фильтра по организации>_<курсор>
+async def admin_panel(order='o', org_ticket=0, cursor=0):
+    dashboard = await db.get_admin_dashboard()
+    total_open_tickets = dashboard['open_tickets']  # Получаем общее количество заявок "В работе"
+    total_closed_tickets = dashboard['closed_tickets']  # Получаем общее количество завершенных заявок
+    tickets_page, has_more = await db.get_tickets_in_progress_page(
+        cursor=cursor, newest_first=(order == 'n'), organization_ticket=org_ticket, limit=ADMIN_PAGE_SIZE)
     
     text = f"<b>🤘 Тикет меню 💲</b>\n\n"
     text += f"<b>🔥Заявок в работе:</b> {total_open_tickets}\n"
     text += f"<b>👍Завершенных заявок:</b> {total_closed_tickets}\n\n"
+    if org_ticket:
+        organization = tickets_page[0][2] if tickets_page else f"как в заявке #{org_ticket}"
+        text += f"<b>🏢 Организация:</b> {organization}\n\n"
     text += f"<b>⚠️ Внимание!</b> <i>Закрытые задачи не могут быть возвращены в работу. Пожалуйста, будьте внимательны при их закрытии!</i>"
     
     keyboard = InlineKeyboardMarkup()
-    for ticket in all_tickets_in_progress:
-        ticket_info = f"Заявка #{ticket[0]} - {ticket[5]}" # Номер и описание заявки
+    for ticket in tickets_page:
+        ticket_info = f"Заявка #{ticket[0]} - {ticket[1]}" # Номер и время заявки
         keyboard.add(InlineKeyboardButton(text=ticket_info, callback_data=f"ticket_{ticket[0]}"))
+    
+    # Навигация по очереди
+    if cursor:
+        keyboard.row(InlineKeyboardButton(text="⏮ В начало", callback_data=f"admin_page_{order}_{org_ticket}_0"))
+    if has_more:
+        keyboard.insert(InlineKeyboardButton(text="🔜 Следующая", callback_data=f"admin_page_{order}_{org_ticket}_{tickets_page[-1][0]}"))
+    
+    # Фильтры очереди
+    if order == 'o':
+        keyboard.row(InlineKeyboardButton(text="🔃 Сначала новые", callback_data=f"admin_page_n_{org_ticket}_0"))
+    else:
+        keyboard.row(InlineKeyboardButton(text="🔃 Сначала старые", callback_data=f"admin_page_o_{org_ticket}_0"))
+    if org_ticket:
+        keyboard.insert(InlineKeyboardButton(text="✖️ Все организации", callback_data=f"admin_page_{order}_0_0"))
+    else:
+        keyboard.insert(InlineKeyboardButton(text="🏢 По организации", callback_data="admin_orgs"))
+    keyboard.add(InlineKeyboardButton(text="🔎 Поиск", callback_data="admin_search"))
+    keyboard.insert(InlineKeyboardButton(text="📊 Статистика", callback_data=f"admin_stats_{render.STATS_PERIODS[0]}"))
     keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu"))
     return text, keyboard
 
 
-
-@dp.callback_query_handler(lambda query: query.data.startswith(('ticket_', 'my_ticket_page_')))
-async def handle_ticket_callback(query: types.CallbackQuery):
-    user_id = query.from_user.id
-    tg_id = user_id
+async def admin_orgs():
+    organizations = await db.get_organizations_in_progress(limit=ADMIN_PAGE_SIZE)
     
+    text = f"<b>🏢 Заявки в работе по организациям</b>\n\n"
+    if not organizations:
+        text += "Заявок в работе нет."
+    
+    keyboard = InlineKeyboardMarkup()
+    for organization, first_ticket, total in organizations:
+        keyboard.add(InlineKeyboardButton(text=f"{organization} ({total})", callback_data=f"admin_page_o_{first_ticket}_0"))
+    keyboard.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_panel"))
+    return text, keyboard
+
+
+
+# Последний поисковый запрос администратора (для пагинации результатов)
+admin_search_queries = {}
+
+
+def is_admin(tg_id):
+    return tg_id in ADMIN_USERS or tg_id == ADMIN_MESSAGE
+
+
+def admin_only(handler):
+    # Обработчик кнопки или позиции только для администраторов:
+    # остальным на колбек отвечаем без действия, сообщение игнорируем
+    @functools.wraps(handler)
+    async def wrapper(event, *args):
+        if not is_admin(event.from_user.id):
+            if isinstance(event, types.CallbackQuery):
+                await event.answer()
+            return
+        return await handler(event, *args)
+    return wrapper
 
-    if query.data.startswith('ticket_'):
-        ticket_id = query.data.split('_')[1]
-        ticket_info = sql.get_ticket_info(ticket_id)
-        sql.update_pos(f'ticket_details_{ticket_info[0]}', 'tg_id', user_id)
+
+# Колбек страницы поиска: admin_search_page_<смещение>
+async def admin_search_results(tg_id, offset=0):
+    search_text = admin_search_queries.get(tg_id, '')
+    tickets, total = await db.search_tickets(search_text, offset=offset, limit=ADMIN_PAGE_SIZE)
+    has_more = offset + len(tickets) < total
+
+    text = f"<b>🔎 Поиск:</b> {html.escape(search_text)}\n<b>Найдено:</b> {total}\n\n"
+    if not tickets:
+        text += "Ничего не найдено."
+    for number, time_ticket, organization, state, snippet in tickets:
+        text += (f"<code>#{number}</code> {html.escape(organization or '')} ({state}, {time_ticket})\n"
+                 f" - <i>{render.search_snippet(snippet, sql.SEARCH_MARK_START, sql.SEARCH_MARK_END)}</i>\n\n")
+
+    keyboard = InlineKeyboardMarkup(row_width=5)
+    for ticket in tickets:
+        keyboard.insert(InlineKeyboardButton(text=f"#{ticket[0]}", callback_data=f"ticket_{ticket[0]}"))
+    if offset:
+        keyboard.row(InlineKeyboardButton(text="⏮ В начало", callback_data="admin_search_page_0"))
+    if has_more:
+        keyboard.insert(InlineKeyboardButton(text="🔜 Следующая", callback_data=f"admin_search_page_{offset + ADMIN_PAGE_SIZE}"))
+    keyboard.row(InlineKeyboardButton(text="🔎 Новый поиск", callback_data="admin_search"))
+    keyboard.insert(InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_panel"))
+    return text, keyboard
+
+
+# Маршруты кнопок (callback_data) и текстовых сообщений (позиция пользователя)
+callbacks = Router()
+positions = Router()
+
+
+async def show_screen(query, screen, pos):
+    # Обновление позиции пользователя (запись в базу выполняется пачкой)
+    user_state.set_pos(query.from_user.id, pos)
+    await query.answer()
+    result = screen(query.from_user.id)
+    text, keyboard = await result if inspect.isawaitable(result) else result
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+# Экраны, которые открываются кнопкой с тем же именем
+for action, screen in {
+    'my_company': my_company,
+    'edit_company_name': edit_company_name,
+    'edit_company_adress': edit_company_adress,
+    'edit_company_inn': edit_company_inn,
+    'edit_company_phone': edit_company_phone,
+    'new_ticket': new_ticket,
+    'my_ticket': my_ticket,
+    'my_ticket_history': my_ticket_history,
+}.items():
+    callbacks.add(action, functools.partial(show_screen, screen=screen, pos=action))
+
+
+@callbacks.route('admin_panel')
+async def on_admin_panel(query):
+    user_state.set_pos(query.from_user.id, 'admin_panel')
+    await query.answer()
+    text, keyboard = await admin_panel()
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route('admin_orgs')
+@admin_only
+async def on_admin_orgs(query):
+    await query.answer()
+    text, keyboard = await admin_orgs()
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route('admin_search')
+@admin_only
+async def on_admin_search(query):
+    # Следующее текстовое сообщение администратора - поисковый запрос
+    user_state.set_pos(query.from_user.id, 'admin_search')
+    await query.answer()
+    await query.message.edit_text(render.ADMIN_SEARCH_TEXT, reply_markup=render.BACK_TO_ADMIN_KEYBOARD, parse_mode="HTML")
+
+
+@callbacks.route_prefix('admin_search_page')
+@admin_only
+async def on_admin_search_page(query, offset):
+    await query.answer()
+    text, keyboard = await admin_search_results(query.from_user.id, int(offset))
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route_prefix('admin_stats')
+@admin_only
+async def on_admin_stats(query, days):
+    # Только периоды с кнопок: отчет строится по дням в потоке базы данных
+    if not days.isdigit() or int(days) not in render.STATS_PERIODS:
         await query.answer()
-        text = f"<b>Детали заявки:</b> <code>#{ticket_info[0]}\n\n</code>" \
-               f"<b>Пользователь ID:</b> <a href='tg://user?id={ticket_info[1]}'>{ticket_info[1]}</a>\n" \
-               f"<b>Организация:</b> {ticket_info[2]}\n" \
-               f"<b>Адрес:</b> {ticket_info[3]}\n\n" \
-               f"<b>Сообщение от пользователя:</b> - <em>{ticket_info[4]}</em>\n\n" \
-               f"<b>Время создания:</b> {ticket_info[5]}\n" \
-               f"<b>Статус:</b> {ticket_info[6]}\n\n" \
-               f"<em>⚠️ Для завершения задачи введите комментарий. В ответ вам придет сообщение с подтвержением!</em>"
-               
-        keyboard = types.InlineKeyboardMarkup()
-        back_button = types.InlineKeyboardButton("⬅️ Назад", callback_data="admin_panel")
-
-        keyboard.add(back_button)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+        return
+    days = int(days)
+    await query.answer()
+    report = await db.get_stats_report(days)
+    text, keyboard = render.stats_report(report, days)
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route('main_menu')
+async def on_main_menu(query):
+    # Позиция 'pos' обновляется внутри main_menu
+    await query.answer()
+    text, keyboard = await main_menu(query.from_user.id)
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route_prefix('ticket')
+async def on_ticket_details(query, ticket_id):
+    ticket_info = await db.get_ticket_info(int(ticket_id))
+    user_state.set_pos(query.from_user.id, f'ticket_details_{ticket_info[0]}')
+    await query.answer()
+    text = render.TICKET_DETAILS_TEMPLATE(ticket_info)
+    await query.message.edit_text(text, reply_markup=render.BACK_TO_ADMIN_KEYBOARD, parse_mode="HTML")
+
+
+@callbacks.route_prefix('admin_page')
+@admin_only
+async def on_admin_page(query, order, org_ticket, cursor):
+    await query.answer()
+    text, keyboard = await admin_panel(order, int(org_ticket), int(cursor))
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route_prefix('my_ticket_page')
+async def on_my_ticket_page(query, page, cursor=None):
+    # Старые кнопки без курсора открывают первую страницу
+    page = int(page) if cursor else 1
+    await query.answer()                  # Ответим на колбек, чтобы убрать "крутилку"
+    # Получаем текст сообщения и клавиатуру с учетом текущей страницы
+    text, keyboard = await my_ticket_history(query.from_user.id, page, cursor)
+    # Редактируем сообщение с новым текстом и клавиатурой
+    await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@callbacks.route_prefix('complete')
+async def on_complete_ticket(query, ticket_id):
+    # Обновление позиции пользователя (запись в базу выполняется пачкой)
+    user_state.set_pos(query.from_user.id, 'complete_')
+    # Статус меняется только из "В работе": повторное нажатие ничего не пишет и не рассылает
+    ticket_info = await db.complete_ticket(ticket_id, completed_by=query.from_user.id)
+    if ticket_info is None:
+        await query.answer("Заявка уже завершена")
+        return
+    await query.answer()
+    ticket_comm_done = ticket_info[7]
+
+    # Время выполнения в секундах считается в базе (последний столбец результата)
+    resolution_seconds = ticket_info[-1]
+    hours = resolution_seconds // 3600 if resolution_seconds is not None else render.NO_DATA
+
+    # Отправка сообщения пользователю о завершении задачи
+    user_id = ticket_info[1]  # ID пользователя, поставившего задачу
+    completion_message = f"🎉 Задача <code>#{ticket_id}</code> выполнена!\n<b>Время выполнения:</b> {hours} часа(ов).\n\n<b>Ответ исполнителя:</b> - <em>{ticket_comm_done}</em>\n\n<em>⚠️ Пожалуйста, проверьте корректность исполнения задачи.</em>"
     
-    
-    if query.data.startswith('my_ticket_page_'):
-        page = int(query.data.split('_')[3])  # Получаем номер страницы из колбека
-        await query.answer()                  # Ответим на колбек, чтобы убрать "крутилку"
-        tg_id = query.from_user.id
-        # Получаем текст сообщения и клавиатуру с учетом текущей страницы
-        text, keyboard = my_ticket_history(tg_id, page)
-        # Редактируем сообщение с новым текстом и клавиатурой
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-
+    notifier.enqueue(user_id, completion_message, reply_markup=render.COMPLETION_USER_KEYBOARD, parse_mode="HTML")
+    notifier.enqueue(query.from_user.id, completion_message, reply_markup=render.COMPLETION_ADMIN_KEYBOARD, parse_mode="HTML")
 
 
 # Группа колбеков на батоны
 @dp.callback_query_handler()
 async def inline_kb_answer_callback_handler(query: types.CallbackQuery):
-    user_id = query.from_user.id
-    tg_id = user_id
-        
-    if query.data == 'admin_panel':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('admin_panel', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = admin_panel()
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-
-    if query.data == 'main_menu':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('main_menu', 'tg_id', user_id)
+    action, handler, args = callbacks.lookup(query.data)
+    if handler is None:
         await query.answer()
-        text, keyboard = main_menu(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+        return
+    with metrics.CALLBACK_SECONDS.time(action):
+        await handler(query, *args)
+
+
+@positions.route_prefix('ticket_details')
+async def on_ticket_comment(message, *args):
+    if len(args) == 1 and args[0].isdigit():
+        ticket_id = int(args[0])
+        # Обновление комментария в базе данных
+        comment_text = message.text
+        await db.update_ticket_comment(ticket_id, comment_text)
         
-    if query.data.startswith('complete_'):   
-        ticket_id = query.data.split('_')[1]
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('complete_', 'tg_id', user_id)
-        await query.answer()
-        sql.update_ticket_status(ticket_id, "Завершена")
-        ticket_comm_done = sql.read_ticket_comment(ticket_id)
-        ticket_info = sql.get_ticket_info(ticket_id)
-            
-        current_time = datetime.datetime.now()
-        time_ticket = datetime.datetime.strptime(ticket_info[5], "%Y-%m-%d %H:%M:%S")
-        time_difference = current_time - time_ticket
+        # Кнопка "✅ Завершить задачу"
+        keyboard = render.complete_ticket_keyboard(ticket_id)
         
-        # Преобразуем общее количество секунд в объект timedelta
-        total_seconds = time_difference.total_seconds()
-        hours = int(total_seconds // 3600) 
+        # Вставляем переменные в текст сообщения
+        success_message = f"<b>Комментарий к тикету <code>#{ticket_id}</code> успешно записан!</b>\n\n<b>Ответ исполнителя:</b> - <em>{comment_text}</em>\n\n<em>⚠️ Если вы допустили ошибку, просто отправьте исправленное сообщение еще раз.</em>"
+        await message.reply(success_message, reply_markup=keyboard, parse_mode="HTML")
+    else:
+        await message.reply("Ошибка формата номера тикета", parse_mode="HTML")
 
-        # Отправка сообщения пользователю о завершении задачи
-        user_id = ticket_info[1]  # ID пользователя, поставившего задачу
-        completion_message = f"🎉 Задача <code>#{ticket_id}</code> выполнена!\n<b>Время выполнения:</b> {hours} часа(ов).\n\n<b>Ответ исполнителя:</b> - <em>{ticket_comm_done}</em>\n\n<em>⚠️ Пожалуйста, проверьте корректность исполнения задачи.</em>"
-        
-        back_button_user = types.InlineKeyboardButton("🧑‍💻 Главное меню", callback_data="main_menu")
-        history_ticket = InlineKeyboardButton(text="☑️ История заявок", callback_data="my_ticket_history")
-        keyboard_markup_user = types.InlineKeyboardMarkup().add(history_ticket, back_button_user)
-        
-        back_button_admin = types.InlineKeyboardButton("🤘Тикет меню", callback_data="admin_panel")
-        keyboard_markup_admin = types.InlineKeyboardMarkup().add(back_button_admin)
-        
-        await bot.send_message(user_id, completion_message, reply_markup=keyboard_markup_user, parse_mode="HTML")
-        await bot.send_message(query.from_user.id, completion_message, reply_markup=keyboard_markup_admin, parse_mode="HTML")  
-        
-    
-    if query.data == 'my_company':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('my_company', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = my_company(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-       
-    if query.data == 'edit_company_name':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('edit_company_name', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = edit_company_name(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-        
-    if query.data == 'edit_company_adress':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('edit_company_adress', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = edit_company_adress(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")     
 
-    if query.data == 'edit_company_inn':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('edit_company_inn', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = edit_company_inn(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
- 
-    if query.data == 'edit_company_phone':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('edit_company_phone', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = edit_company_phone(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-             
-    if query.data == 'new_ticket':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('new_ticket', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = new_ticket(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
-        
-    if query.data == 'my_ticket':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('my_ticket', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = my_ticket(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")      
+async def save_company_field(message, field):
+    await db.update_profile(message.from_user.id, **{field: message.text})
+    text, keyboard = await my_company(message.from_user.id)
+    await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
 
-    if query.data == 'my_ticket_history':
-        # Обновление ячейки 'pos' в базе данных
-        sql.update_pos('my_ticket_history', 'tg_id', user_id)
-        await query.answer()
-        text, keyboard = my_ticket_history(tg_id)
-        await query.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")   
-        
-        
-        
-        
-# Обратотка текстовых сообщений
-@dp.message_handler()
-async def handle_text_input(message: types.Message):
-    
+
+# Позиции ввода данных о компании и поле профиля, в которое пишется ответ
+for pos, field in {
+    'edit_company_name': 'organization',
+    'edit_company_adress': 'organization_adress',
+    'edit_company_inn': 'organization_inn',
+    'edit_company_phone': 'organization_phone',
+}.items():
+    positions.add(pos, functools.partial(save_company_field, field=field))
+
+
+@positions.route('admin_search')
+@admin_only
+async def on_admin_search_text(message):
+    admin_search_queries[message.from_user.id] = message.text
+    text, keyboard = await admin_search_results(message.from_user.id)
+    await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@positions.route('new_ticket')
+async def on_new_ticket_text(message):
     user_id = message.from_user.id
     username = message.from_user.username
-    profile = sql.read_profile(user_id)  
-    organization_name = profile.get("organization", "")
-    organization_address = profile.get("organization_adress", "") 
+    profile = await db.read_profile(user_id)  
     organization_phone = profile.get("organization_phone", "Нет данных")
-    user_position = sql.read_cell('pos', 'tg_id', user_id)
-
-    if user_position.startswith('ticket_details_'):
-        parts = user_position.split('_')
-        if len(parts) == 3 and parts[2].isdigit():
-            ticket_id = int(parts[2])
-            # Обновление комментария в базе данных
-            comment_text = message.text
-            sql.update_ticket_comment(ticket_id, comment_text)
-            
-            # Создаем кнопку "✅ Выполнить"
-            complete_button = types.InlineKeyboardButton("✅ Завершить задачу", callback_data=f"complete_{ticket_id}")
-            keyboard = types.InlineKeyboardMarkup()
-            keyboard.add(complete_button)
-            
-            # Вставляем переменные в текст сообщения
-            success_message = f"<b>Комментарий к тикету <code>#{ticket_id}</code> успешно записан!</b>\n\n<b>Ответ исполнителя:</b> - <em>{comment_text}</em>\n\n<em>⚠️ Если вы допустили ошибку, просто отправьте исправленное сообщение еще раз.</em>"
-            await message.reply(success_message, reply_markup=keyboard, parse_mode="HTML")
-        else:
-            await message.reply("Ошибка формата номера тикета", parse_mode="HTML")
-                
-    if user_position == 'edit_company_name':
-        sql.update_profile_data(user_id, 'organization', message.text)
-        text, keyboard = my_company(user_id)
-        await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
-
+    organization = profile.get("organization", "")
+    addres_ticket = profile.get("organization_adress", "")
+    message_ticket = message.text
+    time_ticket = message.date
 
-    if user_position == 'edit_company_adress':
-        sql.update_profile_data(user_id, 'organization_adress', message.text)
-        text, keyboard = my_company(user_id)
-        await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
+    # Добавляем новую заявку и обновляем профиль в одной транзакции
+    last_ticket_number = await db.create_ticket(user_id, organization, addres_ticket, message_ticket, time_ticket, username)
 
-    if user_position == 'edit_company_inn':
-        sql.update_profile_data(user_id, 'organization_inn', message.text)
-        text, keyboard = my_company(user_id)
+    if last_ticket_number:
+        # Меню благодарочки
+        text, keyboard = done_ticket(last_ticket_number)
         await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
         
-    if user_position == 'edit_company_phone':
-        sql.update_profile_data(user_id, 'organization_phone', message.text)
-        text, keyboard = my_company(user_id)
-        await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
+        # Отправка сообщения администратору
+        admin_text = (f"📬❗️\nПользователь @{username} создал новую заявку с номером <code>#{last_ticket_number}</code>."
+                    f"\n\n<b>Сообщение от пользователя:</b>\n - <em>{message_ticket}</em>"
+                    f"\n\n<b>Телефон:</b> {organization_phone}\n"
+                    f"<b>Компания:</b> {organization}\n"
+                    f"<b>Адрес:</b> {addres_ticket}\n"
+        )
         
-    if user_position == 'new_ticket':
-        user_ticket = user_id
-        organization = organization_name
-        addres_ticket = organization_address
-        message_ticket = message.text
-        time_ticket = message.date
-        state_ticket = "В работе"
-        ticket_comm = ""
-
-        # Добавляем новую заявку в базу данных
-        sql.add_ticket(user_ticket, organization, addres_ticket, message_ticket, time_ticket, state_ticket, ticket_comm)
-        # Получаем номер последней добавленной заявки
-        last_ticket_number = sql.get_last_ticket_number()
-
-        if last_ticket_number:
-            # Обновляем профиль пользователя с номером последней добавленной заявки
-            sql.update_profile_data(user_id, 'history_ticket', str(last_ticket_number))
-            sql.update_profile_data(user_id, 'data_ticket', str(time_ticket))
-            sql.update_profile_data(user_id, 'user_name', str(username))
-            
+        # Рассылка администраторам (или строка в сводке, если включен NOTIFY_DIGEST_INTERVAL).
+        # Текст экранируется после обрезки, чтобы не разрезать HTML-сущность
+        digest_line = render.NEW_TICKET_DIGEST_LINE(
+            last_ticket_number, html.escape(organization or ''), html.escape(message_ticket[:100]))
+        new_ticket_alerts.add(admin_text, digest_line)
+    else:
+        await message.reply("Ошибка при получении заявки.")
 
-            # Меню благодарочки
-            text, keyboard = done_ticket(user_id)
-            await message.reply(text, reply_markup=keyboard, parse_mode="HTML")
-            
-            admin_panel = types.InlineKeyboardButton("🤘Тикет меню🫰", callback_data="admin_panel")
-            keyboard_markup = types.InlineKeyboardMarkup().add(admin_panel)
-            
-            # Отправка сообщения администратору
-            admin_text = (f"📬❗️\nПользователь @{username} создал новую заявку с номером <code>#{last_ticket_number}</code>."
-                        f"\n\n<b>Сообщение от пользователя:</b>\n - <em>{message_ticket}</em>"
-                        f"\n\n<b>Телефон:</b> {organization_phone}\n"
-                        f"<b>Компания:</b> {organization}\n"
-                        f"<b>Адрес:</b> {addres_ticket}\n"
-            )
-            
-            # Добавляем клавиатуру к уведомлению
-            await bot.send_message(ADMIN_MESSAGE, admin_text, parse_mode="HTML", reply_markup=keyboard_markup)
-        else:
-            await message.reply("Ошибка при получении заявки.")
+
+# Обратотка текстовых сообщений
+@dp.message_handler()
+async def handle_text_input(message: types.Message):
+    user_position = await user_state.get_pos(message.from_user.id)
+    if user_position is None:
+        return
+    position, handler, args = positions.lookup(user_position)
+    if handler is not None:
+        with metrics.POSITION_SECONDS.time(position):
+            await handler(message, *args)
             
 
+async def on_startup(dp):
+    # Фоновая запись позиций пользователей и отправка уведомлений
+    user_state.start()
+    notifier.start()
+    # Периодическая сводка метрик в лог (в режиме webhook метрики доступны и на /metrics)
+    metrics.start_logging(METRICS_LOG_INTERVAL)
+    # Перенос старых завершенных заявок в архив
+    archive.start(ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL)
+    # Резервные копии базы и архива
+    backup.start(BACKUP_DIR, BACKUP_INTERVAL, BACKUP_KEEP)
+
+
+async def on_startup_webhook(dp):
+    # Регистрируем адрес webhook в Telegram
+    await bot.set_webhook(WEBHOOK_HOST + WEBHOOK_PATH, max_connections=MAX_CONCURRENT_UPDATES)
+
+
+async def on_shutdown_webhook(dp):
+    await bot.delete_webhook()
+
+
+async def health(request):
+    # Проверка работоспособности для балансировщика/мониторинга
+    return web.json_response({
+        'status': 'ok',
+        'mode': BOT_MODE,
+        'updates_in_flight': concurrency_limit.in_flight,
+        'max_concurrent_updates': concurrency_limit.limit,
+        'notify_queue_depth': notifier.depth,
+        'duplicate_updates': deduplicate_updates.duplicates,
+    })
+
+
+async def metrics_handler(request):
+    # Метрики в текстовом формате Prometheus
+    return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+
+def create_web_app():
+    app = web.Application()
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics_handler)
+    return app
+
+
+async def on_shutdown(dp):
+    # Досылаем уведомления, сохраняем позиции пользователей, закрываем соединения и останавливаем поток базы данных
+    await metrics.stop_logging()
+    await archive.shutdown()
+    await export.shutdown()
+    await backup.shutdown()
+    await new_ticket_alerts.close()
+    await notifier.shutdown()
+    logging.info("Очередь уведомлений: %s", notifier.stats())
+    await user_state.shutdown()
+    logging.info("Кэш пользователей: %s", await db.get_user_cache_stats())
+    await db.shutdown()
+
+
 if __name__ == '__main__':
     executor = aiogram.executor.Executor(dp, loop=loop, skip_updates=True)
-    executor.start_polling()
+    executor.on_startup(on_startup)
+    executor.on_shutdown(on_shutdown)
+    if BOT_MODE == 'webhook':
+        executor.on_startup(on_startup_webhook, polling=False)
+        executor.on_shutdown(on_shutdown_webhook, polling=False)
+        executor.set_webhook(webhook_path=WEBHOOK_PATH, web_app=create_web_app())
+        executor.run_app(host=WEBAPP_HOST, port=WEBAPP_PORT)
+    else:
+        executor.start_polling()
@@ -0,0 +1,89 @@
+"""
+Служебные команды HelpDesk бота.
+
+Пример:
+    python manage.py check-counters --rebuild
+    python manage.py archive-tickets --days 365
+    python manage.py backup --dir backups --keep 7
+"""
+import argparse
+import sys
+import time
+
+from app import backup, sql
+
+
+def check_counters(args):
+    # Проверка счетчиков задач и пересчет при расхождениях
+    mismatches = sql.check_ticket_counters()
+    for tg_id, state, counted, actual in mismatches:
+        print(f"tg_id={tg_id} state={state}: счетчик {counted}, фактически {actual}")
+    if not mismatches:
+        print("Счетчики задач согласованы.")
+        return 0
+    if args.rebuild:
+        sql.rebuild_ticket_counters()
+        print("Счетчики задач пересчитаны.")
+        return 0
+    return 1
+
+
+def rebuild_stats(args):
+    # Пересчет сверток статистики по таблице ticket
+    sql.rebuild_ticket_rollups()
+    print("Статистика пересчитана.")
+    return 0
+
+
+def archive_tickets(args):
+    # Перенос заявок, завершенных больше args.days дней назад, в архив пачками
+    before = int(time.time()) - args.days * 86400
+    total = 0
+    while True:
+        moved = sql.archive_tickets(before, args.batch_size)
+        total += moved
+        if moved < args.batch_size:
+            break
+    print(f"В архив перенесено заявок: {total}. {sql.get_archive_stats()}")
+    return 0
+
+
+def backup_database(args):
+    # Резервные копии основной базы и архива с проверкой целостности и ротацией
+    for result in backup.backup_database(args.dir, args.keep):
+        print(f"{result['path']}: {result['size'] / 2 ** 20:.1f} МБ за {result['seconds']:.1f} с, "
+              f"удалено старых: {len(result['removed'])}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Служебные команды HelpDesk бота")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    counters = subparsers.add_parser('check-counters', help="проверить счетчики задач")
+    counters.add_argument('--rebuild', action='store_true', help="пересчитать счетчики при расхождениях")
+    counters.set_defaults(func=check_counters)
+
+    stats = subparsers.add_parser('rebuild-stats', help="пересчитать свертки статистики")
+    stats.set_defaults(func=rebuild_stats)
+
+    archive = subparsers.add_parser('archive-tickets', help="перенести старые завершенные заявки в архив")
+    archive.add_argument('--days', type=int, required=True, help="возраст заявки в днях с момента завершения")
+    archive.add_argument('--batch-size', type=int, default=500, help="размер пачки")
+    archive.set_defaults(func=archive_tickets)
+
+    backups = subparsers.add_parser('backup', help="создать резервную копию базы")
+    backups.add_argument('--dir', default='backups', help="каталог для копий")
+    backups.add_argument('--keep', type=int, default=backup.KEEP, help="сколько последних копий хранить")
+    backups.set_defaults(func=backup_database)
+
+    args = parser.parse_args(argv)
+    sql.create_tables()
+    try:
+        return args.func(args)
+    finally:
+        sql.close_connections()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import unittest
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import user_state
+
+
+class FakeDB:
+    """
+    База позиций в памяти вместо app.async_sql. Чтение можно задержать
+    до установки события release.
+    """
+
+    def __init__(self, positions):
+        self.positions = dict(positions)
+        self.release = None
+
+    async def read_pos(self, tg_id):
+        pos = self.positions.get(tg_id)
+        if self.release is not None:
+            await self.release.wait()
+        return pos
+
+    async def update_positions(self, batch):
+        self.positions.update(batch)
+
+
+class GetPosRaceTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.db = FakeDB({1: 'main_menu'})
+        self._db, user_state.db = user_state.db, self.db
+        user_state._positions = OrderedDict()
+        user_state._dirty = {}
+
+    def tearDown(self):
+        user_state.db = self._db
+        user_state._positions = OrderedDict()
+        user_state._dirty = {}
+
+    async def test_set_and_flush_during_read(self):
+        # Чтение из базы началось до set_pos и закончилось после flush
+        self.db.release = asyncio.Event()
+        read = asyncio.create_task(user_state.get_pos(1))
+        await asyncio.sleep(0)
+        user_state.set_pos(1, 'new_ticket')
+        await user_state.flush()
+        self.db.release.set()
+
+        self.assertEqual(await read, 'new_ticket')
+        self.assertEqual(self.db.positions[1], 'new_ticket')
+        self.db.release = None
+        self.assertEqual(await user_state.get_pos(1), 'new_ticket')
+
+    async def test_set_and_flush_evicted_during_read(self):
+        # Измененная позиция вытеснена из кэша, пока шло чтение: устаревшее значение не кэшируется
+        self.db.release = asyncio.Event()
+        read = asyncio.create_task(user_state.get_pos(1))
+        await asyncio.sleep(0)
+        user_state.set_pos(1, 'new_ticket')
+        await user_state.flush()
+        user_state._positions.clear()
+        self.db.release.set()
+        await read
+
+        self.assertNotIn(1, user_state._positions)
+        self.db.release = None
+        self.assertEqual(await user_state.get_pos(1), 'new_ticket')
+
+    async def test_miss_is_cached(self):
+        self.assertEqual(await user_state.get_pos(1), 'main_menu')
+        self.assertEqual(user_state._positions[1], 'main_menu')
+
+
+if __name__ == '__main__':
+    unittest.main()